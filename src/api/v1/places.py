@@ -4,33 +4,42 @@ from typing import Annotated
 from uuid import UUID
 
 from async_fastapi_jwt_auth import AuthJWT
-from async_fastapi_jwt_auth.auth_jwt import AuthJWTBearer
-from fastapi import APIRouter, Depends, HTTPException, Query
-from fastapi_cache.decorator import cache
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
+from fastapi.responses import StreamingResponse
 
-from core.common import request_key_builder
-from core.config import settings
+from core.auth import CachedAuthJWTBearer
 from schemas.places import (
+    AutocompleteRequest,
+    AutocompleteResponse,
+    ExportRequest,
+    NearbyBatchItemResponse,
+    NearbyBatchRequest,
     NearbyPlaceRequest,
     NearbyPlaceResponse,
     SearchPlaceRequest,
     SearchPlaceResponse,
+    FavoritePlaceBulkRequest,
+    FavoritePlaceBulkResponse,
     FavoritePlaceCreate,
-    FavoritePlaceResponse
+    FavoritePlaceListRequest,
+    FavoritePlaceResponse,
+    SearchHistoryListRequest,
+    SearchHistoryResponse,
 )
+from services.export import MEDIA_TYPES, ExportService, get_export_service
 from services.place import PlaceServiceABC, get_place_service
 
 router = APIRouter()
 logger = logging.getLogger(__name__)
 
-AuthorizeDep = Annotated[AuthJWT, Depends(AuthJWTBearer())]
+AuthorizeDep = Annotated[AuthJWT, Depends(CachedAuthJWTBearer())]
 PlaceServiceDep = Annotated[PlaceServiceABC, Depends(get_place_service)]
+ExportServiceDep = Annotated[ExportService, Depends(get_export_service)]
 
 
 @router.get('/search',
             status_code=HTTPStatus.OK,
             description='Search places', )
-@cache(expire=settings.redis_ttl, key_builder=request_key_builder)
 async def search_places(
         place_query: Annotated[SearchPlaceRequest, Query()],
         authorize: AuthorizeDep,
@@ -48,10 +57,24 @@ async def search_places(
     raise HTTPException(HTTPStatus.NOT_FOUND, 'Places not found')
 
 
+@router.get('/autocomplete',
+            status_code=HTTPStatus.OK,
+            description='Autocomplete places by name prefix', )
+async def autocomplete_places(
+        place_query: Annotated[AutocompleteRequest, Query()],
+        place_service: PlaceServiceDep,
+) -> list[AutocompleteResponse]:
+    """
+    Эндпоинт для подсказок мест при вводе названия.
+    """
+    if places := await place_service.autocomplete(place_query):
+        return places
+    raise HTTPException(HTTPStatus.NOT_FOUND, 'Places not found')
+
+
 @router.get('/nearby',
             status_code=HTTPStatus.OK,
             description='Getting a list of places by coordinates', )
-@cache(expire=settings.redis_ttl, key_builder=request_key_builder)
 async def get_nearby_places(
         place: Annotated[NearbyPlaceRequest, Query()],
         authorize: AuthorizeDep,
@@ -69,23 +92,116 @@ async def get_nearby_places(
     raise HTTPException(HTTPStatus.NOT_FOUND, 'Places not found')
 
 
+@router.post('/nearby/batch',
+             status_code=HTTPStatus.OK,
+             description='Getting lists of places near several points', )
+async def get_nearby_places_batch(
+        batch: NearbyBatchRequest,
+        authorize: AuthorizeDep,
+        place_service: PlaceServiceDep,
+) -> list[NearbyBatchItemResponse]:
+    """
+    Эндпоинт для поиска ближайших мест сразу для нескольких точек.
+    Результаты возвращаются в порядке точек запроса, ошибки - в элементах ответа.
+    """
+    await authorize.jwt_optional()
+    user_id = await authorize.get_jwt_subject()
+    user_uuid = UUID(user_id) if user_id else None
+    results = await place_service.get_nearby_places_batch(batch.items, user_uuid)
+    logger.info(f'Пользователь {user_id} получил ближайшие места для {len(batch.items)} точек.')
+    return results
+
+
+@router.get('/history',
+            status_code=HTTPStatus.OK,
+            description='Get search history', )
+async def get_search_history(
+        page: Annotated[SearchHistoryListRequest, Query()],
+        response: Response,
+        authorize: AuthorizeDep,
+        place_service: PlaceServiceDep,
+) -> list[SearchHistoryResponse]:
+    """
+    Эндпоинт для получения истории поиска пользователя.
+    Курсор следующей страницы возвращается в заголовке X-Next-Cursor.
+    """
+    await authorize.jwt_required()
+    user_id = await authorize.get_jwt_subject()
+    try:
+        history, next_cursor = await place_service.get_search_history(UUID(user_id), page.limit, page.cursor)
+    except ValueError:
+        raise HTTPException(HTTPStatus.BAD_REQUEST, 'Invalid cursor')
+    if next_cursor:
+        response.headers['X-Next-Cursor'] = next_cursor
+    logger.info(f'Пользователь {user_id} получил историю поиска (кол-во: {len(history)}).')
+    return history
+
+
+@router.get('/history/export',
+            status_code=HTTPStatus.OK,
+            description='Export search history as NDJSON or CSV',
+            response_class=StreamingResponse, )
+async def export_search_history(
+        export: Annotated[ExportRequest, Query()],
+        authorize: AuthorizeDep,
+        export_service: ExportServiceDep,
+) -> StreamingResponse:
+    """
+    Эндпоинт для потоковой выгрузки всей истории поиска пользователя.
+    """
+    await authorize.jwt_required()
+    user_id = await authorize.get_jwt_subject()
+    rows = await export_service.export_search_history(UUID(user_id), export.format)
+    logger.info(f'Пользователь {user_id} выгружает историю поиска ({export.format}).')
+    return StreamingResponse(rows, media_type=MEDIA_TYPES[export.format],
+                             headers={'Content-Disposition': f'attachment; filename="history.{export.format}"'})
+
+
 @router.get('/favorite',
             status_code=HTTPStatus.OK,
             description='Get favorite places', )
 async def get_favorite_places(
+        page: Annotated[FavoritePlaceListRequest, Query()],
+        response: Response,
         authorize: AuthorizeDep,
         place_service: PlaceServiceDep,
 ) -> list[FavoritePlaceResponse]:
     """
     Эндпоинт для получения списка избранных мест.
+    Курсор следующей страницы возвращается в заголовке X-Next-Cursor.
     """
     await authorize.jwt_required()
     user_id = await authorize.get_jwt_subject()
-    favorite_places = await place_service.get_favorite_places(UUID(user_id))
+    try:
+        favorite_places, next_cursor = await place_service.get_favorite_places(UUID(user_id), page.limit, page.cursor)
+    except ValueError:
+        raise HTTPException(HTTPStatus.BAD_REQUEST, 'Invalid cursor')
+    if next_cursor:
+        response.headers['X-Next-Cursor'] = next_cursor
     logger.info(f'Пользователь {user_id} получил список избранных мест (кол-во: {len(favorite_places)}).')
     return favorite_places
 
 
+@router.get('/favorite/export',
+            status_code=HTTPStatus.OK,
+            description='Export favorite places as NDJSON or CSV',
+            response_class=StreamingResponse, )
+async def export_favorite_places(
+        export: Annotated[ExportRequest, Query()],
+        authorize: AuthorizeDep,
+        export_service: ExportServiceDep,
+) -> StreamingResponse:
+    """
+    Эндпоинт для потоковой выгрузки всех избранных мест пользователя.
+    """
+    await authorize.jwt_required()
+    user_id = await authorize.get_jwt_subject()
+    rows = await export_service.export_favorite_places(UUID(user_id), export.format)
+    logger.info(f'Пользователь {user_id} выгружает избранные места ({export.format}).')
+    return StreamingResponse(rows, media_type=MEDIA_TYPES[export.format],
+                             headers={'Content-Disposition': f'attachment; filename="favorites.{export.format}"'})
+
+
 @router.post('/favorite',
              status_code=HTTPStatus.CREATED,
              description='Save favorite place', )
@@ -99,18 +215,36 @@ async def save_favorite_place(
     """
     await authorize.jwt_required()
     user_id = await authorize.get_jwt_subject()
-    place = await place_service.get_place_by_id(favorite_place.place_id)
-
-    if not place:
-        logger.warning(f'Место с ID \'{favorite_place.place_id}\' не найдено.')
-        raise HTTPException(HTTPStatus.NOT_FOUND, 'Place not found')
+    place_id = favorite_place.place_id
 
-    if favorite_place := await place_service.save_favorite_place(place, UUID(user_id)):
-        logger.info(f'Пользователь {user_id} добавил место {place.place_id} в избранное.')
+    if favorite_place := await place_service.save_favorite_place(place_id, UUID(user_id)):
+        logger.info(f'Пользователь {user_id} добавил место {place_id} в избранное.')
         return favorite_place
+
+    if not await place_service.get_place_by_id(place_id):
+        logger.warning(f'Место с ID \'{place_id}\' не найдено.')
+        raise HTTPException(HTTPStatus.NOT_FOUND, 'Place not found')
     raise HTTPException(HTTPStatus.CONFLICT, 'Favorite place already exists')
 
 
+@router.post('/favorite/bulk',
+             status_code=HTTPStatus.OK,
+             description='Add and remove favorite places in bulk', )
+async def update_favorite_places(
+        changes: FavoritePlaceBulkRequest,
+        authorize: AuthorizeDep,
+        place_service: PlaceServiceDep,
+) -> FavoritePlaceBulkResponse:
+    """
+    Эндпоинт для пакетного добавления и удаления мест избранного, например при синхронизации с другим устройством.
+    """
+    await authorize.jwt_required()
+    user_id = await authorize.get_jwt_subject()
+    if result := await place_service.update_favorite_places(changes.add, changes.remove, UUID(user_id)):
+        return result
+    raise HTTPException(HTTPStatus.INTERNAL_SERVER_ERROR, 'Failed to update favorite places')
+
+
 @router.delete('/favorite/{place_id}',
                status_code=HTTPStatus.OK,
                description='Delete favorite place', )
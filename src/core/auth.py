@@ -0,0 +1,43 @@
+import time
+from typing import Optional
+
+from async_fastapi_jwt_auth import AuthJWT
+from async_fastapi_jwt_auth.auth_jwt import AuthJWTBearer
+from fastapi import Request, Response
+
+from core.config import settings
+from core.lru import LRUCache
+
+# Недавно проверенные токены: повторная проверка подписи для них не выполняется до истечения exp.
+verified_tokens = LRUCache(maxsize=settings.authjwt_verified_cache_size)
+
+
+class CachedAuthJWT(AuthJWT):
+    """
+    AuthJWT, который проверяет и декодирует каждый токен один раз.
+
+    Результат проверки берется из общего кэша verified_tokens и хранится в нем
+    не дольше, чем действует сам токен.
+    """
+
+    async def _verified_token(self, encoded_token: str, issuer: Optional[str] = None) -> dict:
+        key = (encoded_token, issuer)
+        if (raw_token := verified_tokens.get(key)) is not None:
+            return raw_token
+
+        raw_token = await super()._verified_token(encoded_token, issuer)
+        if exp := raw_token.get('exp'):
+            verified_tokens.set(key, raw_token, ttl=exp - time.time())
+        return raw_token
+
+
+class CachedAuthJWTBearer(AuthJWTBearer):
+    """
+    Зависимость, создающая один контекст аутентификации на запрос.
+    Контекст сохраняется в request.state.auth и доступен вне системы зависимостей FastAPI.
+    """
+
+    def __call__(self, req: Request = None, res: Response = None) -> AuthJWT:
+        if (auth := getattr(req.state, 'auth', None)) is None:
+            auth = req.state.auth = CachedAuthJWT(req=req, res=res)
+        return auth
@@ -0,0 +1,232 @@
+import asyncio
+import logging
+import os
+import time
+import uuid
+from functools import wraps
+from typing import Any, Callable
+
+import orjson
+from fastapi.encoders import jsonable_encoder
+from fastapi_cache import FastAPICache
+from fastapi_cache.backends.redis import RedisBackend
+from fastapi_cache.coder import Coder
+from redis.asyncio import Redis
+from redis.exceptions import RedisError
+
+from core.lru import LRUCache
+from core.metrics import CACHE_REFRESHES, CACHE_REQUESTS, CACHE_STALE
+
+logger = logging.getLogger(__name__)
+
+INVALIDATION_CHANNEL = 'fastapi-cache:invalidate'
+LOCK_POLL_INTERVAL = 0.05
+
+# Ссылки на фоновые обновления кэша, чтобы задачи не были собраны сборщиком мусора до завершения.
+_refresh_tasks: set[asyncio.Task] = set()
+
+
+class OrjsonCoder(Coder):
+    """
+    Кодирование значений кэша через orjson: заметно быстрее стандартного json на ответах LocationIQ.
+    """
+
+    @classmethod
+    def encode(cls, value: Any) -> bytes:
+        return orjson.dumps(value, default=jsonable_encoder)
+
+    @classmethod
+    def decode(cls, value: bytes) -> Any:
+        return orjson.loads(value)
+
+
+class TwoTierBackend(RedisBackend):
+    """
+    Бэкенд fastapi-cache с локальным LRU-кэшем процесса перед Redis.
+
+    Горячие ключи отдаются из памяти без обращения к Redis. Локальная запись живет не дольше
+    оставшегося TTL в Redis и не дольше local_ttl. При записи или очистке кэша воркер публикует
+    ключ в канал Redis, и остальные воркеры удаляют свою локальную копию.
+    """
+
+    def __init__(self, redis: Redis, max_entries: int, local_ttl: int):
+        super().__init__(redis)
+        self.local = LRUCache(max_entries)
+        self.local_ttl = local_ttl
+        self._worker_id = f'{os.getpid()}-{uuid.uuid4().hex[:8]}'
+        self._task: asyncio.Task | None = None
+
+    def start(self) -> None:
+        self._task = asyncio.create_task(self._listen())
+
+    async def stop(self) -> None:
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+
+    async def get_with_ttl(self, key: str) -> tuple[int, bytes | None]:
+        namespace = self._namespace(key)
+        if (entry := self.local.get(key)) is not None:
+            value, expires_at = entry
+            CACHE_REQUESTS.labels(namespace, 'local', 'hit').inc()
+            return (-1 if expires_at is None else max(0, int(expires_at - time.monotonic()))), value
+        CACHE_REQUESTS.labels(namespace, 'local', 'miss').inc()
+
+        ttl, value = await super().get_with_ttl(key)
+        CACHE_REQUESTS.labels(namespace, 'redis', 'miss' if value is None else 'hit').inc()
+        if value is not None:
+            self._set_local(key, value, ttl)
+        return ttl, value
+
+    async def get(self, key: str) -> bytes | None:
+        if (entry := self.local.get(key)) is not None:
+            return entry[0]
+        return await super().get(key)
+
+    async def set(self, key: str, value: bytes, expire: int | None = None) -> None:
+        async with self.redis.pipeline(transaction=False) as pipe:
+            await pipe.set(key, value, ex=expire).publish(INVALIDATION_CHANNEL, self._message(key)).execute()
+        self._set_local(key, value, expire)
+
+    async def clear(self, namespace: str | None = None, key: str | None = None) -> int:
+        result = await super().clear(namespace, key)
+        await self.redis.publish(INVALIDATION_CHANNEL, self._message(key or ''))
+        self._invalidate(key)
+        return result
+
+    def stats(self) -> dict[str, int]:
+        return self.local.stats()
+
+    def _set_local(self, key: str, value: bytes, ttl: int | None) -> None:
+        # Вместе со значением хранится срок жизни ключа в Redis, чтобы локальный уровень
+        # возвращал тот же TTL, что и Redis. ttl < 0 означает, что срока жизни нет.
+        if ttl is None or ttl < 0:
+            self.local.set(key, (value, None), self.local_ttl)
+        else:
+            self.local.set(key, (value, time.monotonic() + ttl), min(ttl, self.local_ttl))
+
+    def _invalidate(self, key: str | None) -> None:
+        if key:
+            self.local.delete(key)
+        else:
+            self.local.clear()
+
+    def _message(self, key: str) -> str:
+        return f'{self._worker_id} {key}'
+
+    async def _listen(self) -> None:
+        """
+        Принимает сообщения об инвалидации от других воркеров.
+        При обрыве соединения локальный кэш очищается, так как часть сообщений могла быть потеряна.
+        """
+        while True:
+            try:
+                async with self.redis.pubsub() as pubsub:
+                    await pubsub.subscribe(INVALIDATION_CHANNEL)
+                    async for message in pubsub.listen():
+                        if message['type'] != 'message':
+                            continue
+                        worker_id, _, key = message['data'].decode().partition(' ')
+                        if worker_id != self._worker_id:
+                            self._invalidate(key)
+            except RedisError as e:
+                logger.warning(f'Подписка на инвалидацию кэша прервана: {e}')
+                self.local.clear()
+                await asyncio.sleep(1)
+
+    @staticmethod
+    def _namespace(key: str) -> str:
+        # Ключ имеет вид '<prefix>:<namespace>:...'.
+        return key.split(':', 2)[1] if key.count(':') >= 2 else ''
+
+
+def stale_while_revalidate(
+        expire: int,
+        grace: int,
+        namespace: str,
+        key_builder: Callable[..., str],
+        lock_timeout: int,
+        lock_wait: float,
+        refresh_kwargs: dict | None = None,
+):
+    """
+    Кэширует результат асинхронной функции в бэкенде fastapi-cache и отдает устаревшее значение,
+    пока оно обновляется в фоне.
+
+    Ключ хранится в Redis expire + grace секунд; когда до истечения остается не больше grace секунд,
+    значение считается устаревшим. Устаревшее значение возвращается сразу, а обновление выполняет
+    только тот воркер, который захватил блокировку в Redis. Если обновление не удалось,
+    устаревшее значение отдается до конца grace. При промахе функцию вызывает владелец блокировки,
+    остальные воркеры до lock_wait секунд ждут появления значения в кэше.
+    refresh_kwargs добавляются к аргументам при фоновом обновлении (например, низкий приоритет).
+    """
+
+    def decorator(func):
+        @wraps(func)
+        async def wrapper(*args, **kwargs):
+            backend = FastAPICache.get_backend()
+            coder = FastAPICache.get_coder()
+            key = key_builder(func, f'{FastAPICache.get_prefix()}:{namespace}', args=args, kwargs=kwargs)
+
+            async def load(**extra) -> Any:
+                result = await func(*args, **{**kwargs, **extra})
+                try:
+                    await backend.set(key, coder.encode(result), expire + grace)
+                except Exception:
+                    logger.warning(f'Не удалось сохранить ключ {key} в кэше', exc_info=True)
+                return result
+
+            async def refresh() -> None:
+                try:
+                    await load(**(refresh_kwargs or {}))
+                    CACHE_REFRESHES.labels(namespace, 'success').inc()
+                except Exception as e:
+                    CACHE_REFRESHES.labels(namespace, 'error').inc()
+                    logger.warning(f'Не удалось обновить ключ {key} в кэше: {e}')
+
+            try:
+                ttl, cached = await backend.get_with_ttl(key)
+            except Exception:
+                logger.warning(f'Не удалось получить ключ {key} из кэша', exc_info=True)
+                return await func(*args, **kwargs)
+
+            if cached is not None:
+                if 0 <= ttl <= grace:
+                    CACHE_STALE.labels(namespace).inc()
+                    if await _try_lock(backend, key, lock_timeout):
+                        task = asyncio.create_task(refresh())
+                        _refresh_tasks.add(task)
+                        task.add_done_callback(_refresh_tasks.discard)
+                return coder.decode(cached)
+
+            if not await _try_lock(backend, key, lock_timeout):
+                # Значение уже загружает другой воркер.
+                deadline = time.monotonic() + lock_wait
+                while time.monotonic() < deadline:
+                    await asyncio.sleep(LOCK_POLL_INTERVAL)
+                    if (cached := await backend.get(key)) is not None:
+                        return coder.decode(cached)
+            return await load()
+
+        return wrapper
+
+    return decorator
+
+
+async def _try_lock(backend: RedisBackend, key: str, timeout: int) -> bool:
+    """
+    Захватывает блокировку обновления ключа. Блокировка не снимается явно и истекает через timeout секунд,
+    поэтому после неудачного обновления следующая попытка будет не раньше чем через timeout.
+    Без Redis блокировка считается захваченной.
+    """
+    try:
+        return bool(await backend.redis.set(f'{key}:lock', 1, nx=True, ex=timeout))
+    except RedisError as e:
+        logger.warning(f'Не удалось захватить блокировку кэша: {e}')
+        return True
+
+
+cache_backend: TwoTierBackend | None = None
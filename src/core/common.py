@@ -1,34 +1,39 @@
+import inspect
 import logging
 
-import jwt
-from fastapi import Request
-
-from core.config import settings
+from fastapi import Request, Response
 
 logger = logging.getLogger(__name__)
 
+# Параметры запроса к LocationIQ, которые не влияют на результат и не должны попадать в ключ кэша.
+EXCLUDED_PARAMS = frozenset({'key'})
+
+
+def build_upstream_key(url: str, params: dict) -> str:
+    """
+    Формирует нормализованный ключ запроса к LocationIQ по URL и параметрам.
+    """
+    params = {k: v for k, v in params.items() if k not in EXCLUDED_PARAMS}
+    return ':'.join([
+        url,
+        repr(sorted((k, str(v)) for k, v in params.items()))
+    ])
 
-async def request_key_builder(
+
+def upstream_key_builder(
         func,
         namespace: str,
-        request: Request,
-        *args,
-        **kwargs
+        *,
+        request: Request | None = None,
+        response: Response | None = None,
+        args: tuple,
+        kwargs: dict,
 ) -> str:
-    token = request.headers.get('Authorization', '').replace('Bearer ', '')
-    user_id = 'anonymous'
-    if token:
-        try:
-            decoded_token = jwt.decode(token, settings.authjwt_secret_key, algorithms=[settings.authjwt_algorithm])
-            user_id = decoded_token.get('sub', 'anonymous')
-        except jwt.PyJWTError:
-            logger.error('Невалидный токен.')
-
-    cache_key = ':'.join([
-        namespace,
-        user_id,
-        request.method.lower(),
-        request.url.path,
-        repr(sorted(request.query_params.items()))
-    ])
-    return cache_key
+    """
+    Формирует ключ кэша для запроса к LocationIQ.
+
+    Ключ не зависит от пользователя: одинаковые запросы разных пользователей
+    обслуживаются одной записью в кэше.
+    """
+    arguments = inspect.signature(func).bind(*args, **kwargs).arguments
+    return ':'.join([namespace, build_upstream_key(arguments['url'], arguments['params'])])
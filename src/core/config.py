@@ -14,10 +14,23 @@ class Settings(BaseSettings):
     # Настройки приложения
     project_name: str = Field(default='Travel Companion', env='PROJECT_NAME')
     api_version: str = Field(default='v1', env='API_VERSION')
+    # Настройки сервера (server.py): число воркеров (0 - по числу доступных ядер), уровень логирования,
+    # время на завершение начатых запросов при остановке или перезапуске воркера, с, и период публикации
+    # счетчиков компонентов воркера для /metrics, с
+    server_workers: int = Field(default=0, ge=0, env='SERVER_WORKERS')
+    server_log_level: str = Field(default='info', env='SERVER_LOG_LEVEL')
+    server_graceful_timeout: int = Field(default=30, env='SERVER_GRACEFUL_TIMEOUT')
+    server_metrics_interval: float = Field(default=5.0, gt=0, env='SERVER_METRICS_INTERVAL')
 
     # Настройки JWT
     authjwt_secret_key: str = Field(default='secret', env='AUTHJWT_SECRET_KEY')
     authjwt_algorithm: str = Field(default='123', env='AUTHJWT_ALGORITHM')
+    authjwt_verified_cache_size: int = Field(default=10_000, env='AUTHJWT_VERIFIED_CACHE_SIZE')
+
+    # Настройки хеширования паролей (формат method werkzeug, например 'scrypt:32768:8:1' или 'pbkdf2:sha256:600000')
+    password_hash_method: str = Field(default='scrypt:32768:8:1', env='PASSWORD_HASH_METHOD')
+    password_hash_salt_length: int = Field(default=16, env='PASSWORD_HASH_SALT_LENGTH')
+    password_hash_workers: int = Field(default=4, ge=1, env='PASSWORD_HASH_WORKERS')
 
     # Настройки PostgreSQL
     psql_host: str = Field(default='localhost', env='PSQL_HOST')
@@ -26,15 +39,96 @@ class Settings(BaseSettings):
     psql_password: str = Field(default='123qwe', env='PSQL_PASSWORD')
     psql_db: str = Field(default='storage_db', env='PSQL_DB')
     db_engine_echo: bool = Field(default=False, env='DB_ENGINE_ECHO')
+    # Пул соединений: размер, соединения сверх размера, ожидание свободного соединения и время жизни соединения, с
+    db_pool_size: int = Field(default=10, ge=1, env='DB_POOL_SIZE')
+    db_max_overflow: int = Field(default=10, ge=0, env='DB_MAX_OVERFLOW')
+    db_pool_timeout: float = Field(default=10.0, env='DB_POOL_TIMEOUT')
+    db_pool_recycle: int = Field(default=60 * 30, env='DB_POOL_RECYCLE')
+    db_pool_pre_ping: bool = Field(default=True, env='DB_POOL_PRE_PING')
+    # Размер кэша подготовленных выражений asyncpg на соединение и таймаут запроса, с
+    db_statement_cache_size: int = Field(default=100, ge=0, env='DB_STATEMENT_CACHE_SIZE')
+    db_command_timeout: float = Field(default=30.0, env='DB_COMMAND_TIMEOUT')
+    # Подключение через PgBouncer в режиме пулинга по транзакциям: кэши подготовленных выражений отключаются
+    db_pgbouncer: bool = Field(default=False, env='DB_PGBOUNCER')
 
     # Настройки Redis
     redis_host: str = Field(default='localhost', env='REDIS_HOST')
     redis_port: int = Field(default=6379, env='REDIS_PORT')
     redis_ttl: int = Field(default=60 * 5, env='REDIS_TTL')
+    # Локальный кэш процесса перед Redis: число записей и максимальное время жизни записи, с
+    cache_local_max_entries: int = Field(default=2000, env='CACHE_LOCAL_MAX_ENTRIES')
+    cache_local_ttl: int = Field(default=60, env='CACHE_LOCAL_TTL')
+    # Сколько секунд после redis_ttl отдавать устаревшее значение, пока оно обновляется в фоне,
+    # время жизни блокировки обновления и максимальное ожидание значения, загружаемого другим воркером, с
+    cache_stale_grace: int = Field(default=60 * 30, env='CACHE_STALE_GRACE')
+    cache_lock_timeout: int = Field(default=10, env='CACHE_LOCK_TIMEOUT')
+    cache_lock_wait: float = Field(default=2.0, env='CACHE_LOCK_WAIT')
+    # Время жизни страниц избранного пользователя в кэше, с
+    favorites_cache_ttl: int = Field(default=60 * 10, env='FAVORITES_CACHE_TTL')
+
+    # Настройки отложенной записи истории поиска
+    history_batch_size: int = Field(default=500, env='HISTORY_BATCH_SIZE')
+    history_flush_interval: float = Field(default=1.0, env='HISTORY_FLUSH_INTERVAL')
+    history_max_pending: int = Field(default=10_000, env='HISTORY_MAX_PENDING')
+    # Сколько ждать места в переполненном буфере, с, и после скольких неудачных сбросов подряд
+    # отбрасывать строки, которые база отклоняет
+    history_enqueue_timeout: float = Field(default=0.5, env='HISTORY_ENQUEUE_TIMEOUT')
+    history_max_attempts: int = Field(default=3, ge=1, env='HISTORY_MAX_ATTEMPTS')
+    # Секции истории поиска: срок хранения в месяцах (0 - без ограничения), на сколько месяцев вперед
+    # создавать секции и интервал обслуживания, с
+    history_retention_months: int = Field(default=12, env='HISTORY_RETENTION_MONTHS')
+    history_partitions_ahead: int = Field(default=2, env='HISTORY_PARTITIONS_AHEAD')
+    history_maintenance_interval: float = Field(default=60 * 60, env='HISTORY_MAINTENANCE_INTERVAL')
+
+    # Индекс автодополнения: длина индексируемых префиксов слов названия и число мест в одном префиксе
+    autocomplete_min_prefix: int = Field(default=2, ge=1, env='AUTOCOMPLETE_MIN_PREFIX')
+    autocomplete_max_prefix: int = Field(default=12, env='AUTOCOMPLETE_MAX_PREFIX')
+    autocomplete_prefix_capacity: int = Field(default=100, ge=1, env='AUTOCOMPLETE_PREFIX_CAPACITY')
+
+    # Выгрузка избранного и истории поиска: число строк, читаемых из курсора базы за раз и отправляемых одной порцией
+    export_chunk_size: int = Field(default=1000, ge=1, env='EXPORT_CHUNK_SIZE')
 
-    # Настройки LocationIQ
+    # Настройки локального индекса ближайших мест
+    nearby_index_enabled: bool = Field(default=True, env='NEARBY_INDEX_ENABLED')
+    # Изменение точности требует пересчета places.cell для уже сохраненных мест.
+    nearby_cell_precision: int = Field(default=6, ge=1, le=12, env='NEARBY_CELL_PRECISION')
+    nearby_coverage_ttl: int = Field(default=60 * 60 * 24, env='NEARBY_COVERAGE_TTL')
+    nearby_max_cells: int = Field(default=512, env='NEARBY_MAX_CELLS')
+
+    # Настройки сетки для кэширования ближайших мест (точность geohash ячейки и limit общего запроса ячейки)
+    nearby_grid_enabled: bool = Field(default=True, env='NEARBY_GRID_ENABLED')
+    nearby_grid_precision: int = Field(default=7, ge=1, le=12, env='NEARBY_GRID_PRECISION')
+    nearby_grid_limit: int = Field(default=50, env='NEARBY_GRID_LIMIT')
+    # Число точек пакетного запроса ближайших мест, обрабатываемых одновременно
+    nearby_batch_concurrency: int = Field(default=8, ge=1, env='NEARBY_BATCH_CONCURRENCY')
+
+    # Настройки LocationIQ (в LOCATIONIQ_API_KEY можно указать несколько ключей через запятую)
     locationiq_api_key: str = Field(default='', env='LOCATIONIQ_API_KEY')
     locationiq_base_url: str = Field(default='https://eu1.locationiq.com/v1', env='LOCATIONIQ_BASE_URL')
+    # Лимиты на один ключ: запросов в секунду, допустимый всплеск и запросов в сутки (0 - без ограничения)
+    locationiq_rate_per_second: float = Field(default=2.0, env='LOCATIONIQ_RATE_PER_SECOND')
+    locationiq_burst: int = Field(default=2, env='LOCATIONIQ_BURST')
+    locationiq_daily_limit: int = Field(default=5000, env='LOCATIONIQ_DAILY_LIMIT')
+    locationiq_max_wait: float = Field(default=2.0, env='LOCATIONIQ_MAX_WAIT')
+    locationiq_max_queue: int = Field(default=1000, env='LOCATIONIQ_MAX_QUEUE')
+    # Число результатов поиска, запрашиваемое у LocationIQ (не меньше максимального limit в SearchPlaceRequest)
+    locationiq_search_limit: int = Field(default=50, env='LOCATIONIQ_SEARCH_LIMIT')
+    # Число подсказок, запрашиваемое у LocationIQ (не меньше максимального limit в AutocompleteRequest, не больше 20)
+    locationiq_autocomplete_limit: int = Field(default=20, env='LOCATIONIQ_AUTOCOMPLETE_LIMIT')
+
+    # Настройки HTTP-клиента для внешних сервисов
+    http_max_connections: int = Field(default=100, env='HTTP_MAX_CONNECTIONS')
+    http_max_keepalive_connections: int = Field(default=20, env='HTTP_MAX_KEEPALIVE_CONNECTIONS')
+    http_keepalive_expiry: float = Field(default=30.0, env='HTTP_KEEPALIVE_EXPIRY')
+    http_http2: bool = Field(default=False, env='HTTP_HTTP2')
+    http_connect_timeout: float = Field(default=3.0, env='HTTP_CONNECT_TIMEOUT')
+    http_read_timeout: float = Field(default=10.0, env='HTTP_READ_TIMEOUT')
+    http_pool_timeout: float = Field(default=5.0, env='HTTP_POOL_TIMEOUT')
+    http_max_retries: int = Field(default=2, env='HTTP_MAX_RETRIES')
+    http_retry_backoff_base: float = Field(default=0.1, env='HTTP_RETRY_BACKOFF_BASE')
+    http_retry_backoff_max: float = Field(default=2.0, env='HTTP_RETRY_BACKOFF_MAX')
+    http_retry_budget_ratio: float = Field(default=0.2, env='HTTP_RETRY_BUDGET_RATIO')
+    http_retry_budget_min_per_second: float = Field(default=1.0, env='HTTP_RETRY_BUDGET_MIN_PER_SECOND')
 
     @computed_field
     @property
@@ -60,6 +154,11 @@ class Settings(BaseSettings):
             path=self.psql_db,
         )
 
+    @computed_field
+    @property
+    def LOCATIONIQ_API_KEYS(self) -> list[str]:
+        return [key.strip() for key in self.locationiq_api_key.split(',') if key.strip()]
+
     @computed_field
     @property
     def LOCATIONIQ_NEARBY_URL(self) -> str:
@@ -70,6 +169,11 @@ class Settings(BaseSettings):
     def LOCATIONIQ_SEARCH_URL(self) -> str:
         return f'{self.locationiq_base_url}/search'
 
+    @computed_field
+    @property
+    def LOCATIONIQ_AUTOCOMPLETE_URL(self) -> str:
+        return f'{self.locationiq_base_url}/autocomplete'
+
 
 settings = Settings()
 
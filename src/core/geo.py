@@ -0,0 +1,128 @@
+import math
+
+EARTH_RADIUS = 6_371_000
+
+GEOHASH_ALPHABET = '0123456789bcdefghjkmnpqrstuvwxyz'
+
+
+def haversine(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+    """
+    Расстояние между двумя точками в метрах.
+    """
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    d_phi = phi2 - phi1
+    d_lambda = math.radians(lon2 - lon1)
+    a = math.sin(d_phi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(d_lambda / 2) ** 2
+    return 2 * EARTH_RADIUS * math.asin(math.sqrt(a))
+
+
+def bounding_boxes(lat: float, lon: float, radius: float) -> list[tuple[float, float, float, float]]:
+    """
+    Прямоугольники (lat_min, lat_max, lon_min, lon_max), описанные вокруг круга с центром в точке.
+    Круг, пересекающий меридиан 180°, дает два прямоугольника по обе стороны от него,
+    а круг, содержащий полюс, - полосу по всем долготам.
+    """
+    angle = radius / EARTH_RADIUS
+    d_lat = math.degrees(angle)
+    lat_min, lat_max = max(lat - d_lat, -90.0), min(lat + d_lat, 90.0)
+    cos_lat = math.cos(math.radians(lat))
+    if lat_min == -90.0 or lat_max == 90.0 or cos_lat <= math.sin(angle):
+        return [(lat_min, lat_max, -180.0, 180.0)]
+
+    # Наибольшее отклонение круга по долготе (достигается не на широте центра, а ближе к полюсу).
+    d_lon = math.degrees(math.asin(math.sin(angle) / cos_lat))
+    lon_min, lon_max = lon - d_lon, lon + d_lon
+    if lon_min < -180.0:
+        return [(lat_min, lat_max, -180.0, lon_max), (lat_min, lat_max, lon_min + 360.0, 180.0)]
+    if lon_max > 180.0:
+        return [(lat_min, lat_max, lon_min, 180.0), (lat_min, lat_max, -180.0, lon_max - 360.0)]
+    return [(lat_min, lat_max, lon_min, lon_max)]
+
+
+def cell_size(precision: int) -> tuple[float, float]:
+    """
+    Размер ячейки geohash заданной точности в градусах (по широте, по долготе).
+    """
+    bits = precision * 5
+    lon_bits = (bits + 1) // 2
+    lat_bits = bits // 2
+    return 180.0 / 2 ** lat_bits, 360.0 / 2 ** lon_bits
+
+
+def encode_geohash(lat: float, lon: float, precision: int) -> str:
+    """
+    Кодирует координаты в geohash заданной точности.
+    """
+    lat_range, lon_range = [-90.0, 90.0], [-180.0, 180.0]
+    result = []
+    bit, char, even = 0, 0, True
+    while len(result) < precision:
+        value, interval = (lon, lon_range) if even else (lat, lat_range)
+        mid = (interval[0] + interval[1]) / 2
+        if value >= mid:
+            char = char << 1 | 1
+            interval[0] = mid
+        else:
+            char <<= 1
+            interval[1] = mid
+        even = not even
+        bit += 1
+        if bit == 5:
+            result.append(GEOHASH_ALPHABET[char])
+            bit, char = 0, 0
+    return ''.join(result)
+
+
+def decode_geohash_bounds(cell: str) -> tuple[float, float, float, float]:
+    """
+    Границы ячейки geohash (lat_min, lat_max, lon_min, lon_max).
+    """
+    lat_range, lon_range = [-90.0, 90.0], [-180.0, 180.0]
+    even = True
+    for c in cell:
+        value = GEOHASH_ALPHABET.index(c)
+        for shift in range(4, -1, -1):
+            interval = lon_range if even else lat_range
+            mid = (interval[0] + interval[1]) / 2
+            if value >> shift & 1:
+                interval[0] = mid
+            else:
+                interval[1] = mid
+            even = not even
+    return lat_range[0], lat_range[1], lon_range[0], lon_range[1]
+
+
+def cells_in_radius(lat: float, lon: float, radius: float, precision: int, max_cells: int) -> set[str] | None:
+    """
+    Ячейки geohash, пересекающие круг с центром в точке.
+    Возвращает None, если ячеек больше max_cells.
+    """
+    lat_step, lon_step = cell_size(precision)
+    boxes = []
+    for lat_min, lat_max, lon_min, lon_max in bounding_boxes(lat, lon, radius):
+        lat_count = math.floor(lat_max / lat_step) - math.floor(lat_min / lat_step) + 1
+        lon_count = math.floor(lon_max / lon_step) - math.floor(lon_min / lon_step) + 1
+        boxes.append((lat_min, lat_max, lon_min, lon_max, lat_count, lon_count))
+    if sum(box[4] * box[5] for box in boxes) > max_cells:
+        return None
+
+    cells = set()
+    for lat_min, lat_max, lon_min, lon_max, lat_count, lon_count in boxes:
+        for i in range(lat_count):
+            cell_lat = min(lat_min + i * lat_step, lat_max)
+            for j in range(lon_count):
+                cell_lon = min(lon_min + j * lon_step, lon_max)
+                cells.add(encode_geohash(cell_lat, cell_lon, precision))
+    return cells
+
+
+def circle_contains_cell(lat: float, lon: float, radius: float, cell: str) -> bool:
+    """
+    Проверяет, что ячейка geohash целиком лежит внутри круга.
+    """
+    lat_min, lat_max, lon_min, lon_max = decode_geohash_bounds(cell)
+    return all(
+        haversine(lat, lon, corner_lat, corner_lon) <= radius
+        for corner_lat in (lat_min, lat_max)
+        for corner_lon in (lon_min, lon_max)
+    )
@@ -1,7 +1,159 @@
+import asyncio
+import logging
+import random
+import time
+from collections import deque
+
+import httpx
 from httpx import AsyncClient
 
+from core.config import settings
+
+logger = logging.getLogger(__name__)
+
 http_client: AsyncClient | None = None
 
+IDEMPOTENT_METHODS = frozenset({'GET', 'HEAD', 'OPTIONS'})
+# 429 не повторяется: повтор тем же ключом сразу после отказа обошел бы лимиты планировщика запросов.
+RETRY_STATUS_CODES = frozenset({502, 503, 504})
+
+
+class RetryBudget:
+    """
+    Бюджет повторов: за последние window секунд допускается не больше
+    min_per_second * window + ratio * <число запросов> повторов.
+    Не дает повторам многократно умножить нагрузку на внешний сервис во время его сбоя.
+    """
+
+    def __init__(self, ratio: float, min_per_second: float, window: int = 10):
+        self.ratio = ratio
+        self.min_per_second = min_per_second
+        self.window = window
+        # Счетчики по секундам: [секунда, запросы, повторы].
+        self._buckets: deque[list[int]] = deque()
+
+    def record_request(self) -> None:
+        self._bucket()[1] += 1
+
+    def try_withdraw(self) -> bool:
+        bucket = self._bucket()
+        requests = sum(b[1] for b in self._buckets)
+        retries = sum(b[2] for b in self._buckets)
+        if retries + 1 > self.min_per_second * self.window + self.ratio * requests:
+            return False
+        bucket[2] += 1
+        return True
+
+    def _bucket(self) -> list[int]:
+        now = int(time.monotonic())
+        while self._buckets and self._buckets[0][0] <= now - self.window:
+            self._buckets.popleft()
+        if not self._buckets or self._buckets[-1][0] != now:
+            self._buckets.append([now, 0, 0])
+        return self._buckets[-1]
+
+
+class RetryTransport(httpx.AsyncBaseTransport):
+    """
+    Транспорт с повтором идемпотентных запросов при сетевых ошибках и ответах 502/503/504.
+    Паузы между попытками растут экспоненциально со случайным разбросом (full jitter).
+    """
+
+    def __init__(self, transport: httpx.AsyncHTTPTransport, max_retries: int,
+                 backoff_base: float, backoff_max: float, budget: RetryBudget):
+        self.transport = transport
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.budget = budget
+        self.retries = 0
+        self.exhausted = 0
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        self.budget.record_request()
+        attempt = 0
+        while True:
+            try:
+                response = await self.transport.handle_async_request(request)
+            except httpx.TransportError as e:
+                if not self._can_retry(request, attempt):
+                    raise
+                logger.warning(f'Ошибка запроса {request.method} {request.url.path}: {e!r}, повтор.')
+            else:
+                if response.status_code not in RETRY_STATUS_CODES or not self._can_retry(request, attempt):
+                    return response
+                logger.warning(f'Ответ {response.status_code} на {request.method} {request.url.path}, повтор.')
+                await response.aclose()
+
+            attempt += 1
+            self.retries += 1
+            await asyncio.sleep(random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt)))
+
+    async def aclose(self) -> None:
+        await self.transport.aclose()
+
+    def _can_retry(self, request: httpx.Request, attempt: int) -> bool:
+        if request.method not in IDEMPOTENT_METHODS or attempt >= self.max_retries:
+            return False
+        if not self.budget.try_withdraw():
+            self.exhausted += 1
+            return False
+        return True
+
+
+def create_http_client() -> AsyncClient:
+    """
+    Создает HTTP-клиент для внешних сервисов по настройкам приложения.
+    """
+    transport = httpx.AsyncHTTPTransport(
+        http2=settings.http_http2,
+        limits=httpx.Limits(
+            max_connections=settings.http_max_connections,
+            max_keepalive_connections=settings.http_max_keepalive_connections,
+            keepalive_expiry=settings.http_keepalive_expiry,
+        ),
+    )
+    return AsyncClient(
+        transport=RetryTransport(
+            transport,
+            max_retries=settings.http_max_retries,
+            backoff_base=settings.http_retry_backoff_base,
+            backoff_max=settings.http_retry_backoff_max,
+            budget=RetryBudget(
+                ratio=settings.http_retry_budget_ratio,
+                min_per_second=settings.http_retry_budget_min_per_second,
+            ),
+        ),
+        timeout=httpx.Timeout(
+            connect=settings.http_connect_timeout,
+            read=settings.http_read_timeout,
+            write=settings.http_read_timeout,
+            pool=settings.http_pool_timeout,
+        ),
+    )
+
+
+def pool_stats() -> dict[str, int]:
+    """
+    Состояние пула соединений HTTP-клиента: открытые, занятые и свободные соединения,
+    запросы в ожидании свободного соединения, а также число повторов.
+    """
+    if http_client is None or not isinstance(http_client._transport, RetryTransport):
+        return {}
+    transport = http_client._transport
+    pool = transport.transport._pool
+    connections = pool.connections
+    idle = sum(1 for connection in connections if connection.is_idle())
+    return {
+        'max_connections': settings.http_max_connections,
+        'connections': len(connections),
+        'active': len(connections) - idle,
+        'idle': idle,
+        'queued': sum(1 for request in pool._requests if request.is_queued()),
+        'retries': transport.retries,
+        'retry_budget_exhausted': transport.exhausted,
+    }
+
 
 async def get_http_client() -> AsyncClient:
     return http_client
@@ -0,0 +1,246 @@
+import asyncio
+import logging
+import os
+import time
+from pathlib import Path
+from typing import Callable
+
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    generate_latest,
+)
+from prometheus_client import multiprocess
+from prometheus_client.core import GaugeMetricFamily
+from prometheus_client.registry import Collector
+from redis.asyncio import Redis
+from redis.asyncio.client import Pipeline
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+logger = logging.getLogger(__name__)
+
+# Бакеты в секундах: от долей миллисекунды (Redis, кэш) до секунд (LocationIQ).
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+HTTP_REQUEST_DURATION = Histogram(
+    'http_request_duration_seconds',
+    'Время обработки HTTP-запроса',
+    ['method', 'route', 'status'],
+    buckets=LATENCY_BUCKETS,
+)
+LOCATIONIQ_REQUEST_DURATION = Histogram(
+    'locationiq_request_duration_seconds',
+    'Время запроса к API LocationIQ',
+    ['endpoint'],
+    buckets=LATENCY_BUCKETS,
+)
+LOCATIONIQ_RESPONSES = Counter(
+    'locationiq_responses_total',
+    'Ответы API LocationIQ по статусам (error - сетевая ошибка)',
+    ['endpoint', 'status'],
+)
+CACHE_REQUESTS = Counter(
+    'cache_requests_total',
+    'Обращения к кэшу fastapi-cache по уровням (local - память процесса, redis)',
+    ['namespace', 'tier', 'result'],
+)
+CACHE_STALE = Counter(
+    'cache_stale_total',
+    'Ответы устаревшим значением из кэша во время фонового обновления',
+    ['namespace'],
+)
+CACHE_REFRESHES = Counter(
+    'cache_refreshes_total',
+    'Фоновые обновления значений кэша',
+    ['namespace', 'result'],
+)
+AUTOCOMPLETE_RESPONSES = Counter(
+    'autocomplete_responses_total',
+    'Ответы автодополнения по источнику (local - локальный индекс, upstream - с запросом к LocationIQ)',
+    ['source'],
+)
+DB_POOL_CHECKOUT_DURATION = Histogram(
+    'db_pool_checkout_duration_seconds',
+    'Время получения соединения из пула базы данных',
+    buckets=LATENCY_BUCKETS,
+)
+REDIS_COMMAND_DURATION = Histogram(
+    'redis_command_duration_seconds',
+    'Время выполнения команды Redis',
+    ['command'],
+    buckets=LATENCY_BUCKETS,
+)
+
+
+class MetricsMiddleware:
+    """
+    ASGI middleware, измеряющее время обработки запросов по шаблону маршрута.
+    Метка route берется из шаблона пути, чтобы число временных рядов не зависело от параметров.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope['type'] != 'http':
+            await self.app(scope, receive, send)
+            return
+
+        status_code = 500
+        started = time.perf_counter()
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal status_code
+            if message['type'] == 'http.response.start':
+                status_code = message['status']
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            route = scope.get('route')
+            HTTP_REQUEST_DURATION.labels(
+                scope['method'], route.path if route else 'unmatched', status_code,
+            ).observe(time.perf_counter() - started)
+
+
+class MeteredPipeline(Pipeline):
+    async def execute(self, raise_on_error: bool = True):
+        started = time.perf_counter()
+        try:
+            return await super().execute(raise_on_error)
+        finally:
+            REDIS_COMMAND_DURATION.labels('PIPELINE').observe(time.perf_counter() - started)
+
+
+class MeteredRedis(Redis):
+    """
+    Клиент Redis, измеряющий время выполнения каждой команды и конвейера.
+    """
+
+    async def execute_command(self, *args, **options):
+        started = time.perf_counter()
+        try:
+            return await super().execute_command(*args, **options)
+        finally:
+            REDIS_COMMAND_DURATION.labels(args[0]).observe(time.perf_counter() - started)
+
+    def pipeline(self, transaction: bool = True, shard_hint: str | None = None) -> MeteredPipeline:
+        return MeteredPipeline(self.connection_pool, self.response_callbacks, transaction, shard_hint)
+
+
+class StatsCollector(Collector):
+    """
+    Отдает счетчики компонентов (методы stats()) как метрики в момент опроса,
+    не добавляя работы в обработку запросов.
+    """
+
+    def __init__(self, sources: dict[str, Callable[[], dict]]):
+        self.sources = sources
+
+    def values(self):
+        for component, source in self.sources.items():
+            for name, value in source().items():
+                if isinstance(value, (int, float)):
+                    yield f'{component}_{name}', f'{component}: {name}', value
+
+    def collect(self):
+        for name, documentation, value in self.values():
+            gauge = GaugeMetricFamily(name, documentation)
+            gauge.add_metric([], value)
+            yield gauge
+
+
+class StatsPublisher:
+    """
+    Публикует счетчики компонентов в режиме нескольких воркеров (server.py).
+
+    /metrics отдает воркер, принявший запрос, а состояние пулов и очередей у каждого воркера свое,
+    поэтому каждый воркер раз в interval секунд записывает свои счетчики в файлы prometheus_client
+    как Gauge с меткой pid (multiprocess_mode='liveall'). Ряды остановленного воркера удаляются
+    при его остановке.
+    """
+
+    def __init__(self, collectors: list[StatsCollector], interval: float):
+        self.collectors = collectors
+        self.interval = interval
+        self._gauges: dict[str, Gauge] = {}
+        self._task: asyncio.Task | None = None
+
+    def start(self) -> None:
+        self.publish()
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        multiprocess.mark_process_dead(os.getpid())
+
+    def publish(self) -> None:
+        for collector in self.collectors:
+            for name, documentation, value in collector.values():
+                if name not in self._gauges:
+                    self._gauges[name] = Gauge(name, documentation, registry=None, multiprocess_mode='liveall')
+                self._gauges[name].set(value)
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                self.publish()
+            except Exception as e:
+                logger.error(f'Ошибка при публикации счетчиков компонентов: {e}')
+
+
+_stats_collectors: list[StatsCollector] = []
+stats_publisher: StatsPublisher | None = None
+
+
+def register_stats(sources: dict[str, Callable[[], dict]]) -> StatsCollector:
+    collector = StatsCollector(sources)
+    REGISTRY.register(collector)
+    _stats_collectors.append(collector)
+    return collector
+
+
+def is_multiprocess() -> bool:
+    return 'PROMETHEUS_MULTIPROC_DIR' in os.environ
+
+
+def create_stats_publisher(interval: float) -> StatsPublisher:
+    return StatsPublisher(_stats_collectors, interval)
+
+
+def render_metrics() -> tuple[bytes, str]:
+    if not is_multiprocess():
+        return generate_latest(REGISTRY), CONTENT_TYPE_LATEST
+    # Несколько воркеров (server.py): гистограммы и счетчики суммируются по файлам всех воркеров,
+    # счетчики компонентов каждого воркера публикует StatsPublisher с меткой pid.
+    if stats_publisher:
+        stats_publisher.publish()
+    _remove_dead_workers()
+    registry = CollectorRegistry()
+    multiprocess.MultiProcessCollector(registry)
+    return generate_latest(registry), CONTENT_TYPE_LATEST
+
+
+def _remove_dead_workers() -> None:
+    """
+    Удаляет ряды счетчиков компонентов воркеров, завершившихся без остановки приложения (сбой, SIGKILL).
+    """
+    for path in Path(os.environ['PROMETHEUS_MULTIPROC_DIR']).glob('gauge_live*_*.db'):
+        pid = int(path.stem.rsplit('_', 1)[1])
+        try:
+            os.kill(pid, 0)
+        except ProcessLookupError:
+            multiprocess.mark_process_dead(pid)
+        except PermissionError:
+            pass
@@ -0,0 +1,22 @@
+import base64
+from datetime import datetime
+from uuid import UUID
+
+
+def encode_cursor(created_at: datetime, entity_id: UUID) -> str:
+    """
+    Кодирует позицию последней записи страницы в непрозрачный курсор.
+    """
+    return base64.urlsafe_b64encode(f'{created_at.isoformat()}|{entity_id}'.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor: str) -> tuple[datetime, UUID]:
+    """
+    Декодирует курсор в пару (created_at, id). При некорректном курсоре выбрасывает ValueError.
+    """
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode()
+        created_at, _, entity_id = raw.partition('|')
+        return datetime.fromisoformat(created_at), UUID(entity_id)
+    except (ValueError, UnicodeDecodeError) as e:
+        raise ValueError('Некорректный курсор') from e
@@ -0,0 +1,72 @@
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable
+
+from werkzeug.security import check_password_hash, generate_password_hash
+
+
+class PasswordHasher:
+    """
+    Хеширование и проверка паролей в отдельном пуле потоков.
+
+    Вычисление scrypt/pbkdf2 занимает десятки миллисекунд и не должно блокировать
+    цикл событий. Одновременно выполняется не больше max_workers вычислений,
+    остальные ожидают в очереди пула.
+    """
+
+    def __init__(self, max_workers: int, method: str, salt_length: int):
+        self.method = method
+        self.salt_length = salt_length
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='password-hasher')
+        self.max_workers = max_workers
+        self.pending = 0
+        self.completed = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+        self.total_duration = 0.0
+
+    async def hash(self, password: str) -> str:
+        return await self._run(generate_password_hash, password, self.method, self.salt_length)
+
+    async def verify(self, password_hash: str, password: str) -> bool:
+        return await self._run(check_password_hash, password_hash, password)
+
+    def shutdown(self) -> None:
+        self._executor.shutdown(wait=True)
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            'max_workers': self.max_workers,
+            'pending': self.pending,
+            'completed': self.completed,
+            'avg_wait': self.total_wait / self.completed if self.completed else 0.0,
+            'max_wait': self.max_wait,
+            'avg_duration': self.total_duration / self.completed if self.completed else 0.0,
+        }
+
+    async def _run(self, func: Callable, *args) -> Any:
+        def timed() -> tuple[Any, float, float]:
+            started = time.perf_counter()
+            return func(*args), started, time.perf_counter()
+
+        submitted = time.perf_counter()
+        self.pending += 1
+        try:
+            result, started, finished = await asyncio.get_running_loop().run_in_executor(self._executor, timed)
+        finally:
+            self.pending -= 1
+
+        wait = started - submitted
+        self.completed += 1
+        self.total_wait += wait
+        self.max_wait = max(self.max_wait, wait)
+        self.total_duration += finished - started
+        return result
+
+
+password_hasher: PasswordHasher | None = None
+
+
+async def get_password_hasher() -> PasswordHasher:
+    return password_hasher
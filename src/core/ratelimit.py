@@ -0,0 +1,204 @@
+import asyncio
+import hashlib
+import heapq
+import itertools
+import logging
+import time
+from datetime import datetime, timezone
+from http import HTTPStatus
+
+from redis.asyncio import Redis
+from redis.exceptions import RedisError
+
+from core.exceptions import ExternalServiceError
+
+logger = logging.getLogger(__name__)
+
+PRIORITY_HIGH = 0
+PRIORITY_NORMAL = 1
+PRIORITY_LOW = 2
+
+# Token bucket ключа API с суточной квотой. Время берется из Redis, чтобы все воркеры считали одинаково.
+# Возвращает 0, если токен получен, время ожидания в мс, если токенов нет, и -1, если исчерпана суточная квота.
+TOKEN_BUCKET_SCRIPT = """
+local rate = tonumber(ARGV[1])
+local capacity = tonumber(ARGV[2])
+local daily_limit = tonumber(ARGV[3])
+local time = redis.call('TIME')
+local now = tonumber(time[1]) * 1000 + math.floor(tonumber(time[2]) / 1000)
+
+local used = tonumber(redis.call('GET', KEYS[2]) or '0')
+if daily_limit > 0 and used >= daily_limit then
+    return -1
+end
+
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(state[1]) or capacity
+local ts = tonumber(state[2]) or now
+tokens = math.min(capacity, tokens + math.max(0, now - ts) * rate / 1000)
+
+local wait = 0
+if tokens >= 1 then
+    tokens = tokens - 1
+    redis.call('INCR', KEYS[2])
+    redis.call('EXPIRE', KEYS[2], 172800)
+else
+    wait = math.ceil((1 - tokens) * 1000 / rate)
+end
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'ts', now)
+redis.call('PEXPIRE', KEYS[1], math.ceil(capacity * 1000 / rate) + 1000)
+return wait
+"""
+
+
+class UpstreamScheduler:
+    """
+    Планировщик запросов к внешнему API с учетом лимитов каждого ключа.
+
+    Для каждого ключа в Redis ведется token bucket (rate_per_second, burst) и суточный счетчик,
+    поэтому лимиты общие для всех воркеров. Запросы ожидают в очереди по приоритету
+    не дольше max_wait секунд и получают ключ, у которого есть свободный токен.
+    """
+
+    def __init__(self, redis: Redis, api_keys: list[str], rate_per_second: float, burst: int,
+                 daily_limit: int, max_wait: float, max_queue: int, prefix: str = 'upstream-limit'):
+        self.redis = redis
+        self.api_keys = api_keys
+        self.rate_per_second = rate_per_second
+        self.burst = burst
+        self.daily_limit = daily_limit
+        self.max_wait = max_wait
+        self.max_queue = max_queue
+        self.prefix = prefix
+        self._key_ids = [hashlib.sha1(key.encode()).hexdigest()[:12] for key in api_keys]
+        self._script = redis.register_script(TOKEN_BUCKET_SCRIPT)
+        self._queue: list[tuple[int, int, asyncio.Future]] = []
+        self._seq = itertools.count()
+        self._next_key = 0
+        self._wakeup = asyncio.Event()
+        self._task: asyncio.Task | None = None
+        self.granted = 0
+        self.rejected = 0
+        self.total_wait = 0.0
+
+    def start(self) -> None:
+        self._task = asyncio.create_task(self._dispatch())
+
+    async def stop(self) -> None:
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        for _, _, future in self._queue:
+            if not future.done():
+                future.cancel()
+        self._queue.clear()
+
+    @property
+    def queued(self) -> int:
+        return sum(1 for _, _, future in self._queue if not future.done())
+
+    def stats(self) -> dict[str, float]:
+        return {
+            'keys': len(self.api_keys),
+            'queued': self.queued,
+            'granted': self.granted,
+            'rejected': self.rejected,
+            'avg_wait': self.total_wait / self.granted if self.granted else 0.0,
+        }
+
+    async def acquire(self, priority: int = PRIORITY_NORMAL) -> str:
+        """
+        Ожидает свободный токен и возвращает ключ API, от имени которого можно выполнить запрос.
+        """
+        if self.queued >= self.max_queue:
+            self.rejected += 1
+            raise self._too_many_requests()
+
+        started = time.monotonic()
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._queue, (priority, next(self._seq), future))
+        self._wakeup.set()
+        try:
+            api_key = await asyncio.wait_for(asyncio.shield(future), timeout=self.max_wait)
+        except asyncio.TimeoutError:
+            future.cancel()
+            self.rejected += 1
+            raise self._too_many_requests()
+        except BaseException:
+            future.cancel()
+            raise
+
+        self.granted += 1
+        self.total_wait += time.monotonic() - started
+        return api_key
+
+    async def _dispatch(self) -> None:
+        while True:
+            while self._queue and self._queue[0][2].done():
+                heapq.heappop(self._queue)
+            if not self._queue:
+                self._wakeup.clear()
+                await self._wakeup.wait()
+                continue
+
+            api_key, wait = await self._try_acquire()
+            if api_key is not None:
+                _, _, future = heapq.heappop(self._queue)
+                if not future.done():
+                    future.set_result(api_key)
+                continue
+
+            if wait is None:
+                # Суточная квота исчерпана у всех ключей: ждать бессмысленно.
+                _, _, future = heapq.heappop(self._queue)
+                if not future.done():
+                    future.set_exception(ExternalServiceError(
+                        status_code=HTTPStatus.TOO_MANY_REQUESTS,
+                        message='Суточный лимит запросов к LocationIQ исчерпан',
+                    ))
+                continue
+            await asyncio.sleep(wait)
+
+    async def _try_acquire(self) -> tuple[str | None, float | None]:
+        """
+        Пытается получить токен у одного из ключей, начиная со следующего по кругу.
+        Возвращает ключ или минимальное время ожидания (None, если квота исчерпана у всех ключей).
+        """
+        day = datetime.now(timezone.utc).strftime('%Y%m%d')
+        min_wait: float | None = None
+        for offset in range(len(self.api_keys)):
+            index = (self._next_key + offset) % len(self.api_keys)
+            key_id = self._key_ids[index]
+            try:
+                result = await self._script(
+                    keys=[f'{self.prefix}:{key_id}:bucket', f'{self.prefix}:{key_id}:day:{day}'],
+                    args=[self.rate_per_second, self.burst, self.daily_limit],
+                )
+            except RedisError as e:
+                # Без Redis лимиты не соблюдаются, но запросы продолжают обслуживаться.
+                logger.warning(f'Не удалось проверить лимит запросов: {e}')
+                result = 0
+
+            if result == 0:
+                self._next_key = index + 1
+                return self.api_keys[index], None
+            if result > 0:
+                min_wait = result / 1000 if min_wait is None else min(min_wait, result / 1000)
+        return None, min_wait
+
+    @staticmethod
+    def _too_many_requests() -> ExternalServiceError:
+        return ExternalServiceError(
+            status_code=HTTPStatus.TOO_MANY_REQUESTS,
+            message='Превышен лимит запросов к LocationIQ, повторите запрос позже',
+        )
+
+
+locationiq_scheduler: UpstreamScheduler | None = None
+
+
+async def get_locationiq_scheduler() -> UpstreamScheduler | None:
+    return locationiq_scheduler
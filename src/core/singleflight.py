@@ -0,0 +1,52 @@
+import asyncio
+import logging
+from typing import Any, Awaitable, Callable
+
+logger = logging.getLogger(__name__)
+
+
+class SingleFlight:
+    """
+    Объединяет одновременные одинаковые вызовы в один.
+
+    Пока вызов с заданным ключом выполняется, остальные вызовы с тем же ключом
+    не запускаются повторно, а ожидают и получают его результат или исключение.
+    """
+
+    def __init__(self):
+        self._in_flight: dict[str, asyncio.Task] = {}
+        self.calls = 0
+        self.coalesced = 0
+
+    async def do(self, key: str, func: Callable[..., Awaitable[Any]], *args, **kwargs) -> Any:
+        """
+        Выполняет вызов или присоединяется к уже выполняющемуся вызову с тем же ключом.
+        """
+        if (task := self._in_flight.get(key)) is not None:
+            self.coalesced += 1
+            logger.debug(f'Запрос \'{key}\' объединен с уже выполняющимся.')
+        else:
+            self.calls += 1
+            task = asyncio.ensure_future(func(*args, **kwargs))
+            self._in_flight[key] = task
+            task.add_done_callback(lambda t: self._forget(key, t))
+        # Отмена одного ожидающего не должна прерывать общий вызов для остальных.
+        return await asyncio.shield(task)
+
+    def _forget(self, key: str, task: asyncio.Task) -> None:
+        if self._in_flight.get(key) is task:
+            del self._in_flight[key]
+        if not task.cancelled():
+            # Помечаем исключение как полученное, даже если все ожидающие были отменены.
+            task.exception()
+
+    @property
+    def in_flight(self) -> int:
+        return len(self._in_flight)
+
+    def stats(self) -> dict[str, int]:
+        return {
+            'calls': self.calls,
+            'coalesced': self.coalesced,
+            'in_flight': self.in_flight,
+        }
@@ -1,16 +1,74 @@
+import time
+import uuid
+
 from core.config import settings
+from core.metrics import DB_POOL_CHECKOUT_DURATION
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
 from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.orm import DeclarativeBase
+from sqlalchemy.pool import AsyncAdaptedQueuePool
 
 
 class NewBase(DeclarativeBase):
     pass
 
 
+class MeteredQueuePool(AsyncAdaptedQueuePool):
+    """
+    Пул соединений, измеряющий время получения соединения (включая ожидание свободного и pre-ping)
+    и считающий получения, не уложившиеся в pool_timeout.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.checkouts = 0
+        self.checkout_timeouts = 0
+        self.total_checkout_wait = 0.0
+
+    def connect(self):
+        started = time.perf_counter()
+        try:
+            return super().connect()
+        except PoolTimeoutError:
+            self.checkout_timeouts += 1
+            raise
+        finally:
+            wait = time.perf_counter() - started
+            self.checkouts += 1
+            self.total_checkout_wait += wait
+            DB_POOL_CHECKOUT_DURATION.observe(wait)
+
+
+def engine_connect_args() -> dict:
+    """
+    Параметры подключения asyncpg. В режиме PgBouncer (пулинг по транзакциям) кэши подготовленных
+    выражений отключены, а имена выражений уникальны, так как соединение с сервером может меняться.
+    """
+    if settings.db_pgbouncer:
+        return {
+            'statement_cache_size': 0,
+            'prepared_statement_cache_size': 0,
+            'prepared_statement_name_func': lambda: f'__asyncpg_{uuid.uuid4()}__',
+            'command_timeout': settings.db_command_timeout,
+        }
+    return {
+        'statement_cache_size': settings.db_statement_cache_size,
+        'prepared_statement_cache_size': settings.db_statement_cache_size,
+        'command_timeout': settings.db_command_timeout,
+    }
+
+
 async_engine = create_async_engine(
     str(settings.SQLALCHEMY_ASYNC_DATABASE_URI),
     echo=settings.db_engine_echo,
     future=True,
+    poolclass=MeteredQueuePool,
+    pool_size=settings.db_pool_size,
+    max_overflow=settings.db_max_overflow,
+    pool_timeout=settings.db_pool_timeout,
+    pool_recycle=settings.db_pool_recycle,
+    pool_pre_ping=settings.db_pool_pre_ping,
+    connect_args=engine_connect_args(),
 )
 
 async_session = async_sessionmaker(
@@ -20,6 +78,29 @@ async_session = async_sessionmaker(
 )
 
 
+def pool_stats() -> dict[str, int | float]:
+    """
+    Состояние пула соединений с базой: размер, свободные и выданные соединения, соединения сверх размера,
+    а также число получений соединения, среднее время ожидания и число таймаутов.
+    """
+    pool = async_engine.pool
+    stats = {
+        'size': pool.size(),
+        'max_overflow': settings.db_max_overflow,
+        'checked_in': pool.checkedin(),
+        'checked_out': pool.checkedout(),
+        # Счетчик QueuePool отрицателен, пока пул заполнен не полностью.
+        'overflow': max(0, pool.overflow()),
+    }
+    if isinstance(pool, MeteredQueuePool):
+        stats.update({
+            'checkouts': pool.checkouts,
+            'checkout_timeouts': pool.checkout_timeouts,
+            'avg_checkout_wait': pool.total_checkout_wait / pool.checkouts if pool.checkouts else 0.0,
+        })
+    return stats
+
+
 async def get_session() -> AsyncSession:
     async with async_session() as session:
         yield session
@@ -1,6 +1,9 @@
 #!/bin/bash
-set -ex
-sleep 5
-alembic revision --autogenerate -m "Init migration"
-alembic upgrade head
-uvicorn main:app --log-level=debug --host=0.0.0.0 --port=5000
+set -e
+# Миграции применяет отдельный шаг (python migrate.py, сервис migrate в docker-compose).
+# Для запуска одного контейнера без него можно выставить RUN_MIGRATIONS=1.
+if [ "${RUN_MIGRATIONS:-0}" = "1" ]; then
+    python migrate.py
+fi
+# Воркеры по числу ядер (SERVER_WORKERS), SIGHUP перезапускает их по одному без остановки сервиса.
+exec python server.py
@@ -3,19 +3,25 @@ import traceback
 from contextlib import asynccontextmanager
 from core.exceptions import ExternalServiceError
 
-import httpx
 from async_fastapi_jwt_auth.exceptions import MissingTokenError, InvalidHeaderError, JWTDecodeError
 from fastapi import FastAPI, Request, status
-from fastapi.responses import ORJSONResponse
+from fastapi.responses import ORJSONResponse, Response
 from fastapi_cache import FastAPICache
-from fastapi_cache.backends.redis import RedisBackend
-from redis.asyncio import Redis
 
 from api.v1 import auth, places
+from core import auth as auth_module
+from core import cache as cache_module
 from core import http as http_module
+from core import metrics as metrics_module
+from core import password as password_module
+from core import ratelimit as ratelimit_module
 from core.config import settings
 from core.logger import setup_logging
+from db import database as database_module
 from db import redis as redis_module
+from services import autocomplete as autocomplete_module
+from services import place as place_module
+from services import search_history as search_history_module
 
 setup_logging()
 logger = logging.getLogger(__name__)
@@ -96,22 +102,114 @@ async def log_exceptions(request: Request, call_next):
         return ORJSONResponse({'detail': 'Internal server error'}, status_code=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
 
+app.add_middleware(metrics_module.MetricsMiddleware)
+
+# Счетчики компонентов читаются только в момент опроса /metrics.
+metrics_module.register_stats({
+    'db_pool': database_module.pool_stats,
+    'http_pool': http_module.pool_stats,
+    'locationiq_singleflight': place_module.locationiq_flight.stats,
+    'locationiq_scheduler': lambda: (ratelimit_module.locationiq_scheduler.stats()
+                                     if ratelimit_module.locationiq_scheduler else {}),
+    'password_hasher': lambda: password_module.password_hasher.stats() if password_module.password_hasher else {},
+    'search_history_writer': lambda: (search_history_module.search_history_writer.stats()
+                                      if search_history_module.search_history_writer else {}),
+    'search_history_maintenance': lambda: (search_history_module.search_history_maintenance.stats()
+                                           if search_history_module.search_history_maintenance else {}),
+    'jwt_verified_cache': auth_module.verified_tokens.stats,
+    'cache_local': lambda: cache_module.cache_backend.stats() if cache_module.cache_backend else {},
+    'autocomplete_index': lambda: (autocomplete_module.autocomplete_index.stats()
+                                   if autocomplete_module.autocomplete_index else {}),
+})
+
+
+@app.get('/metrics', include_in_schema=False)
+async def metrics():
+    """
+    Метрики приложения в формате Prometheus.
+    """
+    content, content_type = metrics_module.render_metrics()
+    return Response(content=content, media_type=content_type)
+
+
 app.include_router(auth.router, prefix=f'/api/{settings.api_version}/auth', tags=['auth'])
 app.include_router(places.router, prefix=f'/api/{settings.api_version}/places', tags=['places'])
 
 
 async def startup():
     logger.info('Приложение запускается...')
-    http_module.http_client = httpx.AsyncClient()
-    redis_module.redis = Redis(host=settings.redis_host, port=settings.redis_port)
-    FastAPICache.init(RedisBackend(redis_module.redis), prefix='fastapi-cache')
+    http_module.http_client = http_module.create_http_client()
+    password_module.password_hasher = password_module.PasswordHasher(
+        max_workers=settings.password_hash_workers,
+        method=settings.password_hash_method,
+        salt_length=settings.password_hash_salt_length,
+    )
+    redis_module.redis = metrics_module.MeteredRedis(host=settings.redis_host, port=settings.redis_port)
+    cache_module.cache_backend = cache_module.TwoTierBackend(
+        redis_module.redis,
+        max_entries=settings.cache_local_max_entries,
+        local_ttl=settings.cache_local_ttl,
+    )
+    cache_module.cache_backend.start()
+    FastAPICache.init(cache_module.cache_backend, prefix='fastapi-cache', coder=cache_module.OrjsonCoder)
+    if settings.LOCATIONIQ_API_KEYS:
+        ratelimit_module.locationiq_scheduler = ratelimit_module.UpstreamScheduler(
+            redis_module.redis,
+            api_keys=settings.LOCATIONIQ_API_KEYS,
+            rate_per_second=settings.locationiq_rate_per_second,
+            burst=settings.locationiq_burst,
+            daily_limit=settings.locationiq_daily_limit,
+            max_wait=settings.locationiq_max_wait,
+            max_queue=settings.locationiq_max_queue,
+        )
+        ratelimit_module.locationiq_scheduler.start()
+    autocomplete_module.autocomplete_index = autocomplete_module.AutocompleteIndex(
+        redis_module.redis,
+        min_prefix=settings.autocomplete_min_prefix,
+        max_prefix=settings.autocomplete_max_prefix,
+        capacity=settings.autocomplete_prefix_capacity,
+    )
+    autocomplete_module.autocomplete_index.start()
+    search_history_module.search_history_writer = search_history_module.SearchHistoryWriter(
+        batch_size=settings.history_batch_size,
+        flush_interval=settings.history_flush_interval,
+        max_pending=settings.history_max_pending,
+        enqueue_timeout=settings.history_enqueue_timeout,
+        max_attempts=settings.history_max_attempts,
+        autocomplete_index=autocomplete_module.autocomplete_index,
+    )
+    search_history_module.search_history_writer.start()
+    search_history_module.search_history_maintenance = search_history_module.SearchHistoryMaintenance(
+        months_ahead=settings.history_partitions_ahead,
+        retention_months=settings.history_retention_months,
+        interval=settings.history_maintenance_interval,
+    )
+    search_history_module.search_history_maintenance.start()
+    if metrics_module.is_multiprocess():
+        metrics_module.stats_publisher = metrics_module.create_stats_publisher(settings.server_metrics_interval)
+        metrics_module.stats_publisher.start()
     logger.info('Приложение запущено.')
 
 
 async def shutdown():
     logger.info('Приложение останавливается...')
+    if metrics_module.stats_publisher:
+        await metrics_module.stats_publisher.stop()
+    if search_history_module.search_history_maintenance:
+        await search_history_module.search_history_maintenance.stop()
+    if search_history_module.search_history_writer:
+        await search_history_module.search_history_writer.stop()
+    if autocomplete_module.autocomplete_index:
+        await autocomplete_module.autocomplete_index.stop()
+    if ratelimit_module.locationiq_scheduler:
+        await ratelimit_module.locationiq_scheduler.stop()
+    if cache_module.cache_backend:
+        await cache_module.cache_backend.stop()
     if http_module.http_client:
         await http_module.http_client.aclose()
     if redis_module.redis:
         await redis_module.redis.close()
+    if password_module.password_hasher:
+        password_module.password_hasher.shutdown()
+    await database_module.async_engine.dispose()
     logger.info('Приложение остановлено.')
@@ -0,0 +1,53 @@
+"""
+Применение миграций базы данных.
+
+Запускается отдельным шагом перед стартом приложения (сервис migrate в docker-compose),
+поэтому приложение при старте не трогает схему и сразу начинает принимать запросы.
+"""
+import asyncio
+import logging
+from pathlib import Path
+
+from alembic import command
+from alembic.config import Config
+from alembic.script import ScriptDirectory
+from sqlalchemy import pool, text
+from sqlalchemy.exc import ProgrammingError
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Ревизия, соответствующая схеме, которую раньше создавала автогенерация при старте контейнера.
+BASELINE_REVISION = '0001_initial'
+
+
+async def current_revisions() -> set[str]:
+    engine = create_async_engine(str(settings.SQLALCHEMY_ASYNC_DATABASE_URI), poolclass=pool.NullPool)
+    try:
+        async with engine.connect() as connection:
+            result = await connection.execute(text('SELECT version_num FROM alembic_version'))
+            return set(result.scalars())
+    except ProgrammingError:
+        # Таблицы alembic_version еще нет: чистая база.
+        return set()
+    finally:
+        await engine.dispose()
+
+
+def main() -> None:
+    config = Config(str(Path(__file__).with_name('alembic.ini')))
+    known = {script.revision for script in ScriptDirectory.from_config(config).walk_revisions()}
+
+    revisions = asyncio.run(current_revisions())
+    if revisions - known:
+        # База создана автогенерируемыми миграциями, файлов которых нет в репозитории.
+        # Ее схема совпадает с базовой ревизией, недостающее добавят следующие миграции.
+        logger.warning(f'Неизвестные ревизии {revisions - known}, база помечается ревизией {BASELINE_REVISION}')
+        command.stamp(config, BASELINE_REVISION, purge=True)
+    command.upgrade(config, 'head')
+
+
+if __name__ == '__main__':
+    main()
@@ -3,7 +3,7 @@ from logging.config import fileConfig
 
 from alembic import context
 from core.config import settings
-from sqlalchemy import pool
+from sqlalchemy import pool, text
 from sqlalchemy.engine import Connection
 from sqlalchemy.ext.asyncio import async_engine_from_config
 
@@ -27,9 +27,16 @@ if config.config_file_name is not None:
 from models import *
 from db.database import NewBase as Base
 
+from models.places import HISTORY_PARTITION_PREFIX
+
 target_metadata = Base.metadata
 
 
+def include_object(object, name, type_, reflected, compare_to) -> bool:
+    # Секции search_history создаются миграциями и фоновой задачей приложения, в моделях их нет.
+    return not (type_ == 'table' and reflected and compare_to is None and name.startswith(HISTORY_PARTITION_PREFIX))
+
+
 # other values from the config, defined by the needs of env.py,
 # can be acquired:
 # my_important_option = config.get_main_option("my_important_option")
@@ -52,6 +59,7 @@ def run_migrations_offline() -> None:
     context.configure(
         url=url,
         target_metadata=target_metadata,
+        include_object=include_object,
         literal_binds=True,
         dialect_opts={"paramstyle": "named"},
     )
@@ -60,10 +68,15 @@ def run_migrations_offline() -> None:
         context.run_migrations()
 
 
+# Ключ advisory-блокировки: миграции, запущенные одновременно несколькими репликами, выполняются по очереди.
+MIGRATIONS_LOCK_KEY = 7_245_118
+
+
 def do_run_migrations(connection: Connection) -> None:
-    context.configure(connection=connection, target_metadata=target_metadata)
+    context.configure(connection=connection, target_metadata=target_metadata, include_object=include_object)
 
     with context.begin_transaction():
+        connection.execute(text('SELECT pg_advisory_xact_lock(:key)'), {'key': MIGRATIONS_LOCK_KEY})
         context.run_migrations()
 
 
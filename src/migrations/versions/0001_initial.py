@@ -0,0 +1,81 @@
+"""Initial schema
+
+Revision ID: 0001_initial
+Revises:
+Create Date: 2025-04-19 00:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision: str = '0001_initial'
+down_revision: Union[str, None] = None
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        'users',
+        sa.Column('id', postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column('login', sa.String(length=255), nullable=False),
+        sa.Column('password', sa.String(length=255), nullable=False),
+        sa.Column('first_name', sa.String(length=50), nullable=True),
+        sa.Column('last_name', sa.String(length=50), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('id'),
+        sa.UniqueConstraint('login'),
+    )
+    op.create_table(
+        'places',
+        sa.Column('id', postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column('place_id', sa.String(length=255), nullable=False),
+        sa.Column('lat', sa.Float(), nullable=False),
+        sa.Column('lon', sa.Float(), nullable=False),
+        sa.Column('display_name', sa.Text(), nullable=True),
+        sa.Column('place_class', sa.String(length=255), nullable=True),
+        sa.Column('place_type', sa.String(length=255), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.CheckConstraint('lat BETWEEN -90.0 AND 90.0', name='ck_places_lat_range'),
+        sa.CheckConstraint('lon BETWEEN -180.0 AND 180.0', name='ck_places_lon_range'),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('place_id'),
+    )
+    op.create_table(
+        'favorite_places',
+        sa.Column('id', postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column('user_id', postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column('place_id', sa.String(), nullable=False),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(['place_id'], ['places.place_id']),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id']),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('id'),
+        sa.UniqueConstraint('user_id', 'place_id', name='favorite_places_user_place_unique'),
+    )
+    op.create_table(
+        'search_history',
+        sa.Column('id', postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column('user_id', postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column('place_id', sa.String(), nullable=False),
+        sa.Column('search_date', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(['place_id'], ['places.place_id']),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id']),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('id'),
+        sa.UniqueConstraint('user_id', 'place_id', name='search_history_user_place_unique'),
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('search_history')
+    op.drop_table('favorite_places')
+    op.drop_table('places')
+    op.drop_table('users')
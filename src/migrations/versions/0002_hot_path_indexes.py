@@ -0,0 +1,36 @@
+"""Place names and geohash cells, indexes for hot paths
+
+Revision ID: 0002_hot_path_indexes
+Revises: 0001_initial
+Create Date: 2025-05-01 00:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = '0002_hot_path_indexes'
+down_revision: Union[str, None] = '0001_initial'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # IF NOT EXISTS: базы, созданные автогенерацией при старте контейнера, могут уже содержать эти объекты.
+    op.execute('ALTER TABLE places ADD COLUMN IF NOT EXISTS name TEXT')
+    op.execute('ALTER TABLE places ADD COLUMN IF NOT EXISTS cell VARCHAR(12)')
+    op.execute('CREATE INDEX IF NOT EXISTS ix_places_cell ON places (cell)')
+    op.execute('CREATE INDEX IF NOT EXISTS ix_favorite_places_user_created_id '
+               'ON favorite_places (user_id, created_at, id)')
+    op.execute('CREATE INDEX IF NOT EXISTS ix_search_history_user_date ON search_history (user_id, search_date)')
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_search_history_user_date', table_name='search_history')
+    op.drop_index('ix_favorite_places_user_created_id', table_name='favorite_places')
+    op.drop_index('ix_places_cell', table_name='places')
+    op.drop_column('places', 'cell')
+    op.drop_column('places', 'name')
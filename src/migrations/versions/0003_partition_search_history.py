@@ -0,0 +1,105 @@
+"""Partition search_history by month
+
+Revision ID: 0003_partition_search_history
+Revises: 0002_hot_path_indexes
+Create Date: 2025-05-10 00:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision: str = '0003_partition_search_history'
+down_revision: Union[str, None] = '0002_hot_path_indexes'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Секции создаются с месяца самой старой записи по текущий месяц плюс два следующих,
+# дальше их создает фоновая задача приложения.
+CREATE_PARTITIONS = """
+DO $$
+DECLARE
+    month date;
+BEGIN
+    FOR month IN
+        SELECT generate_series(
+            date_trunc('month', COALESCE((SELECT min(search_date) FROM search_history_unpartitioned),
+                                         now() AT TIME ZONE 'utc')),
+            date_trunc('month', now() AT TIME ZONE 'utc') + interval '2 months',
+            interval '1 month'
+        )::date
+    LOOP
+        EXECUTE format('CREATE TABLE %I PARTITION OF search_history FOR VALUES FROM (%L) TO (%L)',
+                       'search_history_p' || to_char(month, 'YYYY_MM'), month, (month + interval '1 month')::date);
+    END LOOP;
+END $$
+"""
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.rename_table('search_history', 'search_history_unpartitioned')
+    # Имена индексов уникальны в схеме, поэтому индексы старой таблицы переименовываются.
+    op.execute('ALTER INDEX search_history_pkey RENAME TO search_history_unpartitioned_pkey')
+    op.execute('ALTER INDEX search_history_id_key RENAME TO search_history_unpartitioned_id_key')
+    op.execute('ALTER INDEX search_history_user_place_unique RENAME TO search_history_unpartitioned_user_place_unique')
+    op.drop_index('ix_search_history_user_date', table_name='search_history_unpartitioned')
+
+    op.create_table(
+        'search_history',
+        sa.Column('id', postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column('user_id', postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column('place_id', sa.String(), nullable=False),
+        sa.Column('search_date', sa.DateTime(), nullable=False),
+        sa.Column('search_month', sa.Date(), nullable=False),
+        sa.ForeignKeyConstraint(['place_id'], ['places.place_id']),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id']),
+        sa.PrimaryKeyConstraint('id', 'search_month'),
+        sa.UniqueConstraint('user_id', 'place_id', 'search_month', name='search_history_user_place_month_unique'),
+        postgresql_partition_by='RANGE (search_month)',
+    )
+    op.create_index('ix_search_history_user_date_id', 'search_history', ['user_id', 'search_date', 'id'])
+    op.execute(CREATE_PARTITIONS)
+    op.execute("""
+        INSERT INTO search_history (id, user_id, place_id, search_date, search_month)
+        SELECT id, user_id, place_id, search_date, date_trunc('month', search_date)::date
+        FROM (
+            SELECT id, user_id, place_id, COALESCE(search_date, now() AT TIME ZONE 'utc') AS search_date
+            FROM search_history_unpartitioned
+        ) AS history
+    """)
+    op.drop_table('search_history_unpartitioned')
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.rename_table('search_history', 'search_history_partitioned')
+    op.execute('ALTER INDEX search_history_pkey RENAME TO search_history_partitioned_pkey')
+    op.execute('ALTER INDEX search_history_user_place_month_unique '
+               'RENAME TO search_history_partitioned_user_place_month_unique')
+    op.drop_index('ix_search_history_user_date_id', table_name='search_history_partitioned')
+
+    op.create_table(
+        'search_history',
+        sa.Column('id', postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column('user_id', postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column('place_id', sa.String(), nullable=False),
+        sa.Column('search_date', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(['place_id'], ['places.place_id']),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id']),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('id'),
+        sa.UniqueConstraint('user_id', 'place_id', name='search_history_user_place_unique'),
+    )
+    op.create_index('ix_search_history_user_date', 'search_history', ['user_id', 'search_date'])
+    # Из помесячных строк остается последняя запись по каждой паре пользователь - место.
+    op.execute("""
+        INSERT INTO search_history (id, user_id, place_id, search_date)
+        SELECT DISTINCT ON (user_id, place_id) id, user_id, place_id, search_date
+        FROM search_history_partitioned
+        ORDER BY user_id, place_id, search_date DESC
+    """)
+    op.drop_table('search_history_partitioned')
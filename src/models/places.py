@@ -1,21 +1,28 @@
 import uuid
-from datetime import datetime
+from datetime import date, datetime
 
 from sqlalchemy import (
     Column,
+    Date,
     DateTime,
     String,
     Float,
     ForeignKey,
+    Index,
     UniqueConstraint,
     Text,
     CheckConstraint,
 )
 from sqlalchemy.dialects.postgresql import UUID
 
+from core.config import settings
+from core.geo import encode_geohash
 from db.database import NewBase as Base
 from schemas.places import BasePlaceResponse
 
+# Секции истории поиска называются search_history_pYYYY_MM.
+HISTORY_PARTITION_PREFIX = 'search_history_p'
+
 
 class Place(Base):
     __tablename__ = 'places'
@@ -25,8 +32,11 @@ class Place(Base):
     lat = Column(Float, nullable=False)
     lon = Column(Float, nullable=False)
     display_name = Column(Text)
+    name = Column(Text)
     place_class = Column(String(255))
     place_type = Column(String(255))
+    # Ячейка geohash для поиска мест по координатам через локальный индекс.
+    cell = Column(String(12), index=True)
     created_at = Column(DateTime, default=datetime.utcnow)
 
     __table_args__ = (
@@ -36,31 +46,54 @@ class Place(Base):
 
     @classmethod
     def from_schema(cls, place: 'BasePlaceResponse') -> 'Place':
-        return cls(
-            place_id=place.place_id,
-            lat=place.lat,
-            lon=place.lon,
-            display_name=place.display_name,
-            place_class=place.place_class,
-            place_type=place.place_type,
-        )
+        return cls(**cls.values_from_schema(place))
+
+    @staticmethod
+    def values_from_schema(place: 'BasePlaceResponse') -> dict:
+        return {
+            'place_id': place.place_id,
+            'lat': place.lat,
+            'lon': place.lon,
+            'display_name': place.display_name,
+            'name': getattr(place, 'name', None),
+            'place_class': place.place_class,
+            'place_type': place.place_type,
+            'cell': encode_geohash(place.lat, place.lon, settings.nearby_cell_precision),
+        }
 
     def __repr__(self) -> str:
         return f'<Place {self.id}>'
 
 
 class SearchHistory(Base):
+    """
+    История поиска, секционированная по месяцам: одна строка на пользователя и место за месяц.
+    Секции создает и удаляет по сроку хранения фоновая задача (services.search_history).
+    """
     __tablename__ = 'search_history'
 
-    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4, unique=True, nullable=False)
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4, nullable=False)
     user_id = Column(UUID(as_uuid=True), ForeignKey('users.id'), nullable=False)
     place_id = Column(String, ForeignKey('places.place_id'), nullable=False)
-    search_date = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    search_date = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False)
+    # Первый день месяца поиска, ключ секционирования.
+    search_month = Column(Date, primary_key=True, nullable=False)
 
     __table_args__ = (
-        UniqueConstraint('user_id', 'place_id', name='search_history_user_place_unique'),
+        UniqueConstraint('user_id', 'place_id', 'search_month', name='search_history_user_place_month_unique'),
+        # Постраничная выборка истории пользователя по (search_date, id).
+        Index('ix_search_history_user_date_id', 'user_id', 'search_date', 'id'),
+        {'postgresql_partition_by': 'RANGE (search_month)'},
     )
 
+    @staticmethod
+    def month_of(value: datetime) -> date:
+        return value.date().replace(day=1)
+
+    @staticmethod
+    def partition_name(month: date) -> str:
+        return f'{HISTORY_PARTITION_PREFIX}{month:%Y_%m}'
+
     def __repr__(self) -> str:
         return f'<SearchHistory {self.id}>'
 
@@ -75,6 +108,8 @@ class FavoritePlace(Base):
 
     __table_args__ = (
         UniqueConstraint('user_id', 'place_id', name='favorite_places_user_place_unique'),
+        # Постраничная выборка избранного пользователя по (created_at, id).
+        Index('ix_favorite_places_user_created_id', 'user_id', 'created_at', 'id'),
     )
 
     def __repr__(self) -> str:
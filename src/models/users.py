@@ -3,7 +3,6 @@ from datetime import datetime
 
 from sqlalchemy import Column, DateTime, String
 from sqlalchemy.dialects.postgresql import UUID
-from werkzeug.security import check_password_hash, generate_password_hash
 
 from db.database import NewBase as Base
 from schemas.users import UserCreate
@@ -19,14 +18,11 @@ class User(Base):
     last_name = Column(String(50))
     created_at = Column(DateTime, default=datetime.utcnow)
 
-    def check_password(self, password: str) -> bool:
-        return check_password_hash(self.password, password)
-
     @classmethod
-    def from_schema(cls, user: 'UserCreate') -> 'User':
+    def from_schema(cls, user: 'UserCreate', password_hash: str) -> 'User':
         return cls(
             login=user.login,
-            password=generate_password_hash(user.password),
+            password=password_hash,
             first_name=user.first_name,
             last_name=user.last_name
         )
@@ -1,13 +1,23 @@
+import unicodedata
 from datetime import datetime
+from typing import Literal
 
 from pydantic import (
     BaseModel,
     Field,
     constr,
+    field_validator,
     UUID4,
 )
 
 
+def normalize_text(value: str) -> str:
+    """
+    Приводит текст к единому виду для сравнения: NFKC, нижний регистр, одиночные пробелы.
+    """
+    return ' '.join(unicodedata.normalize('NFKC', value).lower().split())
+
+
 class BaseCoordinates(BaseModel):
     lat: float = Field(..., gt=-90, lt=90, description='Latitude')
     lon: float = Field(..., gt=-180, lt=180, description='Longitude')
@@ -24,26 +34,56 @@ class SearchPlaceRequest(BaseModel):
     query: str = Field(..., description='Search query')
     limit: int = Field(10, ge=1, le=50, description='Maximum number of results')
 
-    def to_params(self, api_key: str) -> dict:
+    def to_params(self, api_key: str, limit: int) -> dict:
+        """
+        Параметры запроса к LocationIQ. Лимит задается вызывающим, а не пользователем,
+        чтобы запросы с разными limit обслуживались одной записью в кэше.
+        """
         return {
             'key': api_key,
-            'q': self.query,
+            'q': self.normalized_query(),
+            'limit': limit,
             'format': 'json',
         }
 
+    def normalized_query(self) -> str:
+        return normalize_text(self.query)
+
 
 class SearchPlaceResponse(BasePlaceResponse):
     importance: float | None = None
 
 
+class AutocompleteRequest(SearchPlaceRequest):
+    limit: int = Field(10, ge=1, le=20, description='Maximum number of results')
+
+    def to_params(self, api_key: str, limit: int) -> dict:
+        return {
+            'key': api_key,
+            'q': self.normalized_query(),
+            'limit': limit,
+            'dedupe': 1,
+        }
+
+
+class AutocompleteResponse(BasePlaceResponse):
+    name: str | None = None
+
+
 class NearbyPlaceRequest(BaseCoordinates):
-    tags: list[str] | None = Field(
+    tags: list[str] = Field(
         default_factory=list,
         description='Search tag or advanced tags. Example: \'amenity:* or !amenity:gym\''
     )
     radius: int = Field(500, ge=100, le=5000, description='Search radius in meters')
     limit: int = Field(10, ge=1, le=50, description='Maximum number of results')
 
+    @field_validator('tags', mode='before')
+    @classmethod
+    def empty_tags(cls, value):
+        # "tags": null в теле пакетного запроса означает поиск без тегов.
+        return [] if value is None else value
+
     def to_params(self, api_key: str) -> dict:
         return {
             'key': api_key,
@@ -55,18 +95,74 @@ class NearbyPlaceRequest(BaseCoordinates):
             'format': 'json',
         }
 
+    def normalized_tags(self) -> list[str]:
+        return sorted({tag.strip().lower() for value in self.tags for tag in value.split(',') if tag.strip()})
+
 
 class NearbyPlaceResponse(BasePlaceResponse):
     name: str | None = 'No name'
     distance: float | None = None
 
 
+class NearbyBatchRequest(BaseModel):
+    items: list[NearbyPlaceRequest] = Field(..., min_length=1, max_length=100, description='Points to search near')
+
+
+class NearbyBatchItemResponse(BaseModel):
+    status_code: int
+    places: list[NearbyPlaceResponse] = Field(default_factory=list)
+    detail: str | None = None
+
+
 class FavoritePlaceCreate(BaseModel):
     place_id: str = Field(..., description='Place ID')
 
 
+class FavoritePlaceBulkRequest(BaseModel):
+    add: list[str] = Field(default_factory=list, max_length=1000, description='Place IDs to add')
+    remove: list[str] = Field(default_factory=list, max_length=1000, description='Place IDs to remove')
+
+
+class FavoritePlaceBulkResponse(BaseModel):
+    added: list[str]
+    removed: list[str]
+    skipped: list[str] = Field(default_factory=list, description='Unknown places or places already in favorites')
+
+
+class PageRequest(BaseModel):
+    limit: int = Field(100, ge=1, le=500, description='Maximum number of results')
+    cursor: str | None = Field(default=None, description='Cursor from the X-Next-Cursor header of the previous page')
+
+
+class FavoritePlaceListRequest(PageRequest):
+    pass
+
+
+class SearchHistoryListRequest(PageRequest):
+    pass
+
+
+ExportFormat = Literal['ndjson', 'csv']
+
+
+class ExportRequest(BaseModel):
+    format: ExportFormat = Field('ndjson', description='Export format')
+
+
+class PlaceDetails(BasePlaceResponse):
+    name: str | None = None
+
+
 class FavoritePlaceResponse(BaseModel):
     id: UUID4
     user_id: UUID4
     place_id: constr(strip_whitespace=True, min_length=1, max_length=255)
     created_at: datetime
+    place: PlaceDetails | None = None
+
+
+class SearchHistoryResponse(BaseModel):
+    id: UUID4
+    place_id: constr(strip_whitespace=True, min_length=1, max_length=255)
+    search_date: datetime
+    place: PlaceDetails | None = None
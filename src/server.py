@@ -0,0 +1,77 @@
+"""
+Запуск приложения в боевом режиме.
+
+Поднимает по воркеру uvicorn на каждое доступное ядро (или SERVER_WORKERS) с циклом событий uvloop
+и парсером httptools. Воркеры запускаются отдельными процессами (spawn), поэтому клиенты HTTP и Redis,
+пулы соединений и локальные кэши создаются в lifespan каждого воркера и между процессами не делятся.
+
+Сигналы главному процессу:
+    SIGHUP - поочередный перезапуск воркеров (например, после обновления настроек); каждый воркер
+             дожидается завершения начатых запросов, остальные в это время продолжают обслуживать клиентов;
+    SIGTTIN / SIGTTOU - добавить / убрать воркер;
+    SIGTERM / SIGINT - плавная остановка.
+"""
+import logging
+import math
+import os
+import shutil
+import tempfile
+from pathlib import Path
+
+import uvicorn
+
+from core.config import settings
+from core.logger import setup_logging
+
+logger = logging.getLogger(__name__)
+
+
+def available_cpus() -> int:
+    """
+    Число ядер, доступных процессу, с учетом привязки к ядрам и квоты CPU контейнера (cgroup v2).
+    """
+    cpus = len(os.sched_getaffinity(0))
+    try:
+        quota, period = Path('/sys/fs/cgroup/cpu.max').read_text().split()
+        if quota != 'max':
+            cpus = min(cpus, max(1, math.ceil(int(quota) / int(period))))
+    except (OSError, ValueError):
+        pass
+    return cpus
+
+
+def setup_multiprocess_metrics() -> None:
+    """
+    Включает режим нескольких процессов prometheus_client: воркеры пишут метрики в файлы общей директории,
+    и /metrics любого воркера отдает сумму по всем. Переменная окружения наследуется воркерами.
+    """
+    path = os.environ.get('PROMETHEUS_MULTIPROC_DIR')
+    if path:
+        # Файлы прошлого запуска исказили бы счетчики.
+        shutil.rmtree(path, ignore_errors=True)
+        os.makedirs(path)
+    else:
+        os.environ['PROMETHEUS_MULTIPROC_DIR'] = tempfile.mkdtemp(prefix='prometheus-')
+
+
+def main() -> None:
+    setup_logging()
+    workers = settings.server_workers or available_cpus()
+    if workers > 1:
+        setup_multiprocess_metrics()
+    logger.info(f'Запуск воркеров: {workers}, соединений с базой данных до '
+                f'{workers * (settings.db_pool_size + settings.db_max_overflow)}.')
+    uvicorn.run(
+        'main:app',
+        host='0.0.0.0',
+        port=5000,
+        workers=workers,
+        loop='uvloop',
+        http='httptools',
+        log_level=settings.server_log_level,
+        timeout_graceful_shutdown=settings.server_graceful_timeout,
+    )
+
+
+if __name__ == '__main__':
+    main()
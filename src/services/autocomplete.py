@@ -0,0 +1,221 @@
+import asyncio
+import logging
+import re
+
+import orjson
+from redis.asyncio import Redis
+from redis.exceptions import RedisError
+from sqlalchemy import select
+
+from db.database import async_session
+from models.places import Place
+from schemas.places import NearbyPlaceResponse, normalize_text
+
+logger = logging.getLogger(__name__)
+
+AUTOCOMPLETE_PREFIX = 'autocomplete'
+PLACES_KEY = f'{AUTOCOMPLETE_PREFIX}:places'
+REFS_KEY = f'{AUTOCOMPLETE_PREFIX}:refs'
+# Заполнение индекса выполняет воркер, захвативший блокировку; отметка о завершении ставится только в конце.
+BACKFILL_DONE_KEY = f'{AUTOCOMPLETE_PREFIX}:backfill:done'
+BACKFILL_LOCK_KEY = f'{AUTOCOMPLETE_PREFIX}:backfill:lock'
+BACKFILL_LOCK_TTL = 60
+BACKFILL_BATCH_SIZE = 1000
+
+WORD_RE = re.compile(r'\w+')
+
+# Заглушка имени у ближайших мест без названия не индексируется.
+PLACEHOLDER_NAMES = {NearbyPlaceResponse.model_fields['name'].default}
+
+# Места префикса и их данные за одно обращение к Redis.
+FIND_SCRIPT = """
+local ids = redis.call('ZRANGE', KEYS[1], 0, tonumber(ARGV[1]) - 1)
+if #ids == 0 then
+    return {}
+end
+return redis.call('HMGET', KEYS[2], unpack(ids))
+"""
+
+# Добавляет место во множества его префиксов и обрезает их до capacity. Для каждого места в REFS_KEY хранится
+# число множеств, в которых оно есть; данные места удаляются из PLACES_KEY, когда оно вытеснено из всех.
+ADD_SCRIPT = """
+local place_id, data, score, capacity = ARGV[1], ARGV[2], tonumber(ARGV[3]), tonumber(ARGV[4])
+local refs = 0
+for i = 3, #KEYS do
+    refs = refs + redis.call('ZADD', KEYS[i], score, place_id)
+    local evicted = redis.call('ZRANGE', KEYS[i], capacity, -1)
+    if #evicted > 0 then
+        redis.call('ZREMRANGEBYRANK', KEYS[i], capacity, -1)
+        for _, id in ipairs(evicted) do
+            if id == place_id then
+                refs = refs - 1
+            elseif redis.call('HINCRBY', KEYS[2], id, -1) <= 0 then
+                redis.call('HDEL', KEYS[2], id)
+                redis.call('HDEL', KEYS[1], id)
+            end
+        end
+    end
+end
+if redis.call('HINCRBY', KEYS[2], place_id, refs) > 0 then
+    redis.call('HSET', KEYS[1], place_id, data)
+else
+    redis.call('HDEL', KEYS[2], place_id)
+    redis.call('HDEL', KEYS[1], place_id)
+end
+return refs
+"""
+
+
+def words(value: str) -> list[str]:
+    return WORD_RE.findall(normalize_text(value))
+
+
+class AutocompleteIndex:
+    """
+    Префиксный индекс мест для подсказок при вводе.
+
+    Для каждого слова названия места (name, а если его нет - первой части display_name) place_id
+    добавляется в сортированные множества всех префиксов слова длиной от min_prefix до max_prefix
+    с весом, равным длине названия: короткие, более общие названия идут первыми. Множество префикса
+    обрезается до capacity мест. Данные мест хранятся в хэше, и подсказки отдаются без обращения к базе;
+    данные места удаляются, когда оно вытеснено из всех множеств, поэтому память ограничена числом
+    различных префиксов, умноженным на capacity. Индекс хранится в Redis и общий
+    для всех воркеров; он пополняется при сохранении новых мест, а места, сохраненные до его
+    появления, добавляет однократное заполнение при старте.
+    """
+
+    def __init__(self, redis: Redis, min_prefix: int, max_prefix: int, capacity: int):
+        self.redis = redis
+        self.min_prefix = min_prefix
+        self.max_prefix = max_prefix
+        self.capacity = capacity
+        self._find = redis.register_script(FIND_SCRIPT)
+        self._add = redis.register_script(ADD_SCRIPT)
+        self._task: asyncio.Task | None = None
+        self.indexed_places = 0
+
+    def stats(self) -> dict[str, int]:
+        return {'indexed_places': self.indexed_places}
+
+    def start(self) -> None:
+        self._task = asyncio.create_task(self._backfill())
+
+    async def stop(self) -> None:
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+
+    async def find(self, query: str, limit: int) -> list[dict]:
+        """
+        Ищет места, у которых каждое слово запроса является началом одного из слов названия
+        или адреса. Кандидаты берутся по префиксу первого слова запроса.
+        """
+        query_words = words(query)
+        if not query_words or len(query_words[0]) < self.min_prefix:
+            return []
+
+        try:
+            raw_places = await self._find(keys=[self._prefix_key(query_words[0][:self.max_prefix]), PLACES_KEY],
+                                          args=[self.capacity])
+        except RedisError as e:
+            logger.warning(f'Не удалось прочитать индекс автодополнения: {e}')
+            return []
+
+        found = []
+        for raw in raw_places:
+            if raw is None:
+                continue
+            place = orjson.loads(raw)
+            place_words = words(f'{place["name"] or ""} {place["display_name"]}')
+            if all(any(word.startswith(query_word) for word in place_words) for query_word in query_words):
+                found.append(place)
+                if len(found) == limit:
+                    break
+        return found
+
+    async def add(self, places: list[Place]) -> None:
+        """
+        Добавляет места в индекс. Повторное добавление места ничего не меняет.
+        """
+        if not places:
+            return
+        try:
+            async with self.redis.pipeline(transaction=False) as pipe:
+                for place in places:
+                    title = self._title(place)
+                    if not (prefixes := self._prefixes(title)):
+                        continue
+                    data = orjson.dumps({
+                        'place_id': place.place_id,
+                        'lat': place.lat,
+                        'lon': place.lon,
+                        'display_name': place.display_name,
+                        'name': place.name if place.name not in PLACEHOLDER_NAMES else None,
+                        'class': place.place_class,
+                        'type': place.place_type,
+                    })
+                    await self._add(keys=[PLACES_KEY, REFS_KEY, *map(self._prefix_key, sorted(prefixes))],
+                                    args=[place.place_id, data, len(title), self.capacity], client=pipe)
+                await pipe.execute()
+        except RedisError as e:
+            logger.warning(f'Не удалось обновить индекс автодополнения: {e}')
+            return
+        self.indexed_places += len(places)
+
+    async def _backfill(self) -> None:
+        """
+        Однократно добавляет в индекс места, уже сохраненные в базе. Выполняет один воркер.
+        Блокировка продлевается после каждой порции и снимается при любом завершении, а без продления
+        истекает через BACKFILL_LOCK_TTL секунд (воркер остановлен принудительно). Пока заполнение
+        не завершено, воркеры раз в BACKFILL_LOCK_TTL секунд пытаются его захватить.
+        """
+        while True:
+            try:
+                if await self.redis.exists(BACKFILL_DONE_KEY):
+                    return
+                if await self.redis.set(BACKFILL_LOCK_KEY, 1, nx=True, ex=BACKFILL_LOCK_TTL):
+                    try:
+                        await self._backfill_places()
+                    finally:
+                        await self.redis.delete(BACKFILL_LOCK_KEY)
+                    return
+            except Exception as e:
+                logger.error(f'Ошибка при заполнении индекса автодополнения: {e}')
+            await asyncio.sleep(BACKFILL_LOCK_TTL)
+
+    async def _backfill_places(self) -> None:
+        logger.info('Заполнение индекса автодополнения запущено.')
+        async with async_session() as session:
+            result = await session.stream_scalars(select(Place).execution_options(yield_per=BACKFILL_BATCH_SIZE))
+            async for places in result.partitions():
+                await self.add(places)
+                await self.redis.expire(BACKFILL_LOCK_KEY, BACKFILL_LOCK_TTL)
+        await self.redis.set(BACKFILL_DONE_KEY, 1)
+        logger.info(f'Заполнение индекса автодополнения завершено (мест: {self.indexed_places}).')
+
+    def _prefixes(self, title: str) -> set[str]:
+        return {
+            word[:length]
+            for word in words(title)
+            for length in range(self.min_prefix, min(len(word), self.max_prefix) + 1)
+        }
+
+    @staticmethod
+    def _title(place: Place) -> str:
+        if place.name and place.name not in PLACEHOLDER_NAMES:
+            return place.name
+        return (place.display_name or '').split(',', 1)[0]
+
+    @staticmethod
+    def _prefix_key(prefix: str) -> str:
+        return f'{AUTOCOMPLETE_PREFIX}:prefix:{prefix}'
+
+
+autocomplete_index: AutocompleteIndex | None = None
+
+
+async def get_autocomplete_index() -> AutocompleteIndex | None:
+    return autocomplete_index
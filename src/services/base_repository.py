@@ -1,6 +1,7 @@
 import logging
 from abc import ABC
 
+from sqlalchemy.dialects.postgresql import insert
 from sqlalchemy.exc import IntegrityError
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
@@ -40,6 +41,40 @@ class BaseRepository(ABC):
             logger.error(f'Неизвестная ошибка при сохранении в базу данных: {e}')
             return None
 
+    async def _upsert_entities(self, model, rows: list[dict], index_elements: list[str],
+                               update_fields: list[str] | None = None, update_where=None) -> list:
+        """
+        Сохраняет сущности одним запросом INSERT ... ON CONFLICT ... RETURNING.
+        При конфликте по index_elements обновляет поля update_fields (если выполнено условие update_where),
+        а если они не заданы, пропускает строку.
+        Возвращает вставленные и обновленные сущности. При ошибке откатывает транзакцию и пробрасывает
+        исключение, чтобы вызывающий мог повторить запись.
+        """
+        # Дубликаты внутри одного запроса недопустимы для ON CONFLICT DO UPDATE.
+        rows = list({tuple(row[key] for key in index_elements): row for row in rows}.values())
+        if not rows:
+            return []
+
+        query = insert(model).values(rows)
+        if update_fields:
+            query = query.on_conflict_do_update(
+                index_elements=index_elements,
+                set_={field: query.excluded[field] for field in update_fields},
+                where=update_where,
+            )
+        else:
+            query = query.on_conflict_do_nothing(index_elements=index_elements)
+
+        try:
+            result = await self.db.execute(query.returning(model))
+            entities = list(result.scalars().all())
+            await self.db.commit()
+            return entities
+        except Exception as e:
+            await self.db.rollback()
+            logger.error(f'Ошибка при пакетном сохранении в базу данных: {e}')
+            raise
+
     async def _delete_entity(self, entity):
         """
         Удаляет сущность в базу данных.
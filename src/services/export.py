@@ -0,0 +1,103 @@
+import csv
+import io
+import logging
+from datetime import datetime
+from typing import Annotated, AsyncIterator
+from uuid import UUID
+
+import orjson
+from fastapi import Depends
+from sqlalchemy import Select, select
+
+from core.config import settings
+from db.database import async_session
+from models.places import FavoritePlace, Place, SearchHistory
+from schemas.places import ExportFormat
+from services.search_history import SearchHistoryWriter, get_search_history_writer
+
+logger = logging.getLogger(__name__)
+SearchHistoryWriterDep = Annotated[SearchHistoryWriter | None, Depends(get_search_history_writer)]
+
+MEDIA_TYPES: dict[str, str] = {
+    'ndjson': 'application/x-ndjson',
+    'csv': 'text/csv; charset=utf-8',
+}
+
+# Поля места в выгрузке называются так же, как в ответах API.
+PLACE_COLUMNS = (
+    Place.lat,
+    Place.lon,
+    Place.name,
+    Place.display_name,
+    Place.place_class.label('class'),
+    Place.place_type.label('type'),
+)
+
+
+class ExportService:
+    """
+    Потоковая выгрузка избранного и истории поиска в NDJSON или CSV.
+
+    Строки читаются через серверный курсор порциями по chunk_size и сразу кодируются в ответ,
+    поэтому расход памяти не зависит от объема выгрузки.
+    """
+
+    def __init__(self, chunk_size: int, history_writer: SearchHistoryWriter | None = None):
+        self.chunk_size = chunk_size
+        self.history_writer = history_writer
+
+    async def export_favorite_places(self, user_id: UUID, export_format: ExportFormat) -> AsyncIterator[bytes]:
+        query = (
+            select(FavoritePlace.id, FavoritePlace.place_id, FavoritePlace.created_at, *PLACE_COLUMNS)
+            .join(Place, Place.place_id == FavoritePlace.place_id)
+            .filter(FavoritePlace.user_id == user_id)
+            .order_by(FavoritePlace.created_at.desc(), FavoritePlace.id.desc())
+        )
+        return self._stream(query, export_format)
+
+    async def export_search_history(self, user_id: UUID, export_format: ExportFormat) -> AsyncIterator[bytes]:
+        if self.history_writer:
+            # Недавние поиски пользователя могут быть еще в буфере отложенной записи.
+            await self.history_writer.flush_pending(user_id=user_id)
+
+        query = (
+            select(SearchHistory.id, SearchHistory.place_id, SearchHistory.search_date, *PLACE_COLUMNS)
+            .join(Place, Place.place_id == SearchHistory.place_id)
+            .filter(SearchHistory.user_id == user_id)
+            .order_by(SearchHistory.search_date.desc(), SearchHistory.id.desc())
+        )
+        return self._stream(query, export_format)
+
+    async def _stream(self, query: Select, export_format: ExportFormat) -> AsyncIterator[bytes]:
+        """
+        Читает результат запроса серверным курсором и отдает закодированные порции строк.
+        Сессия открывается на время выгрузки: сессия зависимости запроса закрывается до отправки ответа.
+        """
+        rows_count = 0
+        async with async_session() as session:
+            result = await session.stream(query.execution_options(yield_per=self.chunk_size))
+            columns = list(result.keys())
+            if export_format == 'csv':
+                yield _encode_csv([columns])
+            async for rows in result.partitions():
+                rows_count += len(rows)
+                if export_format == 'csv':
+                    yield _encode_csv([[_csv_value(value) for value in row] for row in rows])
+                else:
+                    yield b''.join(orjson.dumps(dict(zip(columns, row)), option=orjson.OPT_APPEND_NEWLINE)
+                                   for row in rows)
+        logger.info(f'Выгрузка завершена (строк: {rows_count}).')
+
+
+def _encode_csv(rows: list[list]) -> bytes:
+    buffer = io.StringIO()
+    csv.writer(buffer).writerows(rows)
+    return buffer.getvalue().encode()
+
+
+def _csv_value(value):
+    return value.isoformat() if isinstance(value, datetime) else value
+
+
+def get_export_service(history_writer: SearchHistoryWriterDep) -> ExportService:
+    return ExportService(settings.export_chunk_size, history_writer)
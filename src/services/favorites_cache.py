@@ -0,0 +1,91 @@
+import logging
+from typing import Annotated
+from uuid import UUID
+
+import orjson
+from fastapi import Depends
+from redis.asyncio import Redis
+from redis.exceptions import RedisError
+
+from core.config import settings
+from db.redis import get_redis
+from schemas.places import FavoritePlaceResponse
+
+logger = logging.getLogger(__name__)
+
+FAVORITES_PREFIX = 'favorites'
+
+# Читает текущую версию списка пользователя и страницу этой версии за одно обращение к Redis.
+GET_PAGE_SCRIPT = """
+local version = redis.call('GET', KEYS[1]) or '0'
+return {version, redis.call('GET', ARGV[1] .. version .. ARGV[2])}
+"""
+
+
+class FavoritesCache:
+    """
+    Кэш страниц избранного пользователя в Redis.
+
+    Ключ страницы содержит версию списка пользователя. Каждое изменение избранного увеличивает версию
+    после фиксации в базе, поэтому страницы, прочитанные до изменения, больше не отдаются,
+    даже если запрос на чтение сохранил их в кэш после записи. Ключ версии хранится без срока жизни,
+    чтобы версия не могла вернуться к прежнему значению.
+    """
+
+    def __init__(self, redis: Redis, ttl: int):
+        self.redis = redis
+        self.ttl = ttl
+        self._get_page = redis.register_script(GET_PAGE_SCRIPT)
+
+    async def get(self, user_id: UUID, limit: int,
+                  cursor: str | None) -> tuple[str | None, tuple[list[FavoritePlaceResponse], str | None] | None]:
+        """
+        Возвращает версию списка и закэшированную страницу (None, если ее нет).
+        Версия None означает, что Redis недоступен и сохранять страницу не нужно.
+        """
+        try:
+            version, raw = await self._get_page(
+                keys=[self._version_key(user_id)],
+                args=[f'{FAVORITES_PREFIX}:{user_id}:v', f':{limit}:{cursor or ""}'],
+            )
+        except RedisError as e:
+            logger.warning(f'Не удалось прочитать кэш избранного: {e}')
+            return None, None
+
+        version = version.decode()
+        if raw is None:
+            return version, None
+        page = orjson.loads(raw)
+        return version, ([FavoritePlaceResponse.model_validate(item) for item in page['items']], page['next_cursor'])
+
+    async def set(self, user_id: UUID, version: str, limit: int, cursor: str | None,
+                  items: list[FavoritePlaceResponse], next_cursor: str | None) -> None:
+        page = {
+            'items': [item.model_dump(mode='json', by_alias=True) for item in items],
+            'next_cursor': next_cursor,
+        }
+        try:
+            await self.redis.set(self._page_key(user_id, version, limit, cursor), orjson.dumps(page), ex=self.ttl)
+        except RedisError as e:
+            logger.warning(f'Не удалось сохранить кэш избранного: {e}')
+
+    async def invalidate(self, user_id: UUID) -> None:
+        """
+        Делает недействительными все закэшированные страницы пользователя.
+        """
+        try:
+            await self.redis.incr(self._version_key(user_id))
+        except RedisError as e:
+            logger.error(f'Не удалось сбросить кэш избранного пользователя {user_id}: {e}')
+
+    @staticmethod
+    def _version_key(user_id: UUID) -> str:
+        return f'{FAVORITES_PREFIX}:{user_id}:version'
+
+    @staticmethod
+    def _page_key(user_id: UUID, version: str, limit: int, cursor: str | None) -> str:
+        return f'{FAVORITES_PREFIX}:{user_id}:v{version}:{limit}:{cursor or ""}'
+
+
+async def get_favorites_cache(redis: Annotated[Redis, Depends(get_redis)]) -> FavoritesCache:
+    return FavoritesCache(redis, settings.favorites_cache_ttl)
@@ -0,0 +1,114 @@
+import logging
+import math
+
+from redis.asyncio import Redis
+from redis.exceptions import RedisError
+
+from core.geo import decode_geohash_bounds, encode_geohash, haversine
+from schemas.places import NearbyPlaceRequest
+from services.nearby_index import complete_radius
+
+logger = logging.getLogger(__name__)
+
+# Радиусы, до которых округляется радиус запроса при построении общего запроса к LocationIQ.
+RADIUS_BUCKETS = (250, 500, 1000, 2000, 5000)
+GRID_PREFIX = 'nearby-grid'
+
+
+def quantize_request(place: NearbyPlaceRequest, precision: int, limit: int) -> NearbyPlaceRequest:
+    """
+    Строит общий запрос для всех точек ячейки geohash: центр ячейки, радиус, округленный вверх
+    до RADIUS_BUCKETS и увеличенный на расстояние от центра до угла ячейки, и максимальный limit.
+    Круг такого запроса содержит круг исходного запроса для любой точки ячейки.
+    """
+    lat_min, lat_max, lon_min, lon_max = decode_geohash_bounds(encode_geohash(place.lat, place.lon, precision))
+    lat, lon = round((lat_min + lat_max) / 2, 7), round((lon_min + lon_max) / 2, 7)
+    half_diagonal = max(
+        haversine(lat, lon, corner_lat, corner_lon)
+        for corner_lat in (lat_min, lat_max)
+        for corner_lon in (lon_min, lon_max)
+    )
+    bucket = next((radius for radius in RADIUS_BUCKETS if radius >= place.radius), place.radius)
+    # model_copy не валидирует значения: радиус общего запроса может превышать допустимый для пользователя.
+    return place.model_copy(update={
+        'lat': lat,
+        'lon': lon,
+        'tags': place.normalized_tags(),
+        'radius': math.ceil(bucket + half_diagonal),
+        'limit': limit,
+    })
+
+
+def answer_from_superset(place: NearbyPlaceRequest, superset: NearbyPlaceRequest,
+                         raw_data: list[dict]) -> list[dict] | None:
+    """
+    Отвечает на запрос по результатам общего запроса ячейки: оставляет места в радиусе запроса
+    и пересчитывает расстояние от точных координат.
+
+    Точность: набор и порядок мест совпадают с ответом LocationIQ на точный запрос, расстояния
+    считаются по формуле гаверсинусов и округляются до метра (расхождение с LocationIQ не больше 0.5%).
+    Если общий ответ обрезан по limit и не гарантирует полноту ответа для точки, возвращается None,
+    и нужен точный запрос.
+    """
+    offset = haversine(place.lat, place.lon, superset.lat, superset.lon)
+    guaranteed_radius = complete_radius(superset, raw_data) - offset
+
+    found = []
+    for item in raw_data:
+        distance = haversine(place.lat, place.lon, float(item['lat']), float(item['lon']))
+        if distance <= place.radius:
+            found.append((distance, item))
+    found.sort(key=lambda pair: pair[0])
+
+    if place.radius > guaranteed_radius and (
+            len(found) < place.limit or found[place.limit - 1][0] > guaranteed_radius):
+        return None
+    return [{**item, 'distance': round(distance)} for distance, item in found[:place.limit]]
+
+
+def may_answer_from_superset(place: NearbyPlaceRequest, superset: NearbyPlaceRequest,
+                             known_radius: float | None) -> bool:
+    """
+    Решает до запроса к LocationIQ, может ли общий запрос ячейки ответить на запрос, чтобы при заведомой
+    неполноте не тратить на него отдельный запрос и токен планировщика. Общий запрос не подходит,
+    если limit запроса больше limit общего запроса, радиус не укладывается в RADIUS_BUCKETS или
+    известно (known_radius из GridCompleteness), что ответ для ячейки полон в меньшем радиусе, чем нужно точке.
+    """
+    if place.limit > superset.limit or place.radius > RADIUS_BUCKETS[-1]:
+        return False
+    if known_radius is None:
+        return True
+    return place.radius + haversine(place.lat, place.lon, superset.lat, superset.lon) <= known_radius
+
+
+class GridCompleteness:
+    """
+    Радиус, в котором ответ на общий запрос ячейки был полным, для ячеек, где ответ обрезан по limit.
+    Хранится в Redis ttl секунд; по нему следующие запросы ячейки с большим радиусом сразу идут точным запросом.
+    """
+
+    def __init__(self, redis: Redis, ttl: int):
+        self.redis = redis
+        self.ttl = ttl
+
+    async def get(self, superset: NearbyPlaceRequest) -> float | None:
+        try:
+            value = await self.redis.get(self._key(superset))
+        except RedisError as e:
+            logger.warning(f'Не удалось прочитать полноту общего запроса ячейки: {e}')
+            return None
+        return float(value) if value is not None else None
+
+    async def remember(self, superset: NearbyPlaceRequest, raw_data: list[dict]) -> None:
+        radius = complete_radius(superset, raw_data)
+        if radius >= superset.radius:
+            return
+        try:
+            await self.redis.set(self._key(superset), radius, ex=self.ttl)
+        except RedisError as e:
+            logger.warning(f'Не удалось сохранить полноту общего запроса ячейки: {e}')
+
+    @staticmethod
+    def _key(superset: NearbyPlaceRequest) -> str:
+        return (f'{GRID_PREFIX}:{",".join(superset.tags)}:{superset.lat}:{superset.lon}'
+                f':{superset.radius}:{superset.limit}')
@@ -0,0 +1,152 @@
+import logging
+
+from redis.asyncio import Redis
+from redis.exceptions import RedisError
+from sqlalchemy import and_, or_
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+
+from core.config import settings
+from core.geo import bounding_boxes, cells_in_radius, circle_contains_cell, haversine
+from models.places import Place
+from schemas.places import NearbyPlaceRequest
+from services.base_repository import BaseRepository
+
+logger = logging.getLogger(__name__)
+
+COVERAGE_PREFIX = 'nearby-coverage'
+
+
+def is_supported_tags(tags: list[str]) -> bool:
+    """
+    Проверяет, что теги можно сопоставить с сохраненными местами.
+    Поддерживаются только теги вида 'class:type', 'class:*' и их отрицания через '!'.
+    Набор мест по умолчанию (пустые теги) и сокращения LocationIQ локально не воспроизводятся.
+    """
+    return bool(tags) and all(':' in tag.removeprefix('!') for tag in tags)
+
+
+def match_tags(tags: list[str], place_class: str | None, place_type: str | None) -> bool:
+    """
+    Проверяет, соответствует ли место набору тегов.
+    """
+    def matches(tag: str) -> bool:
+        tag_class, _, tag_type = tag.partition(':')
+        return tag_class == place_class and tag_type in ('*', place_type)
+
+    include = [tag for tag in tags if not tag.startswith('!')]
+    exclude = [tag[1:] for tag in tags if tag.startswith('!')]
+    if any(matches(tag) for tag in exclude):
+        return False
+    return not include or any(matches(tag) for tag in include)
+
+
+def complete_radius(place: NearbyPlaceRequest, raw_data: list[dict]) -> float:
+    """
+    Радиус вокруг точки запроса, в котором ответ LocationIQ содержит все подходящие места:
+    весь радиус запроса, если вернулось меньше limit мест, иначе расстояние до самого дальнего из них.
+    """
+    if len(raw_data) < place.limit:
+        return place.radius
+    return max(
+        float(item['distance']) if item.get('distance') is not None
+        else haversine(place.lat, place.lon, float(item['lat']), float(item['lon']))
+        for item in raw_data
+    )
+
+
+class NearbyPlaceIndex(BaseRepository):
+    """
+    Локальный индекс ближайших мест по ячейкам geohash таблицы places.
+
+    Ячейка считается покрытой для набора тегов, если она целиком лежит в круге,
+    для которого ответ LocationIQ был полным: весь радиус запроса, если вернулось
+    меньше limit мест, иначе расстояние до самого дальнего из них.
+    Покрытие хранится в Redis и устаревает через nearby_coverage_ttl секунд.
+    """
+
+    def __init__(self, db: AsyncSession, redis: Redis):
+        super().__init__(db)
+        self.redis = redis
+
+    async def find(self, place: NearbyPlaceRequest) -> list[dict] | None:
+        """
+        Ищет ближайшие места в локальном индексе.
+        Возвращает None, если область покрыта не полностью и нужен запрос к LocationIQ.
+        """
+        tags = place.normalized_tags()
+        if not is_supported_tags(tags):
+            return None
+
+        cells = cells_in_radius(place.lat, place.lon, place.radius,
+                                settings.nearby_cell_precision, settings.nearby_max_cells)
+        if cells is None:
+            return None
+
+        try:
+            covered = await self.redis.exists(*(self._coverage_key(tags, cell) for cell in cells))
+        except RedisError as e:
+            logger.warning(f'Не удалось проверить покрытие локального индекса: {e}')
+            return None
+        if covered < len(cells):
+            return None
+
+        query = select(Place).filter(
+            Place.cell.in_(cells),
+            or_(*(
+                and_(Place.lat.between(lat_min, lat_max), Place.lon.between(lon_min, lon_max))
+                for lat_min, lat_max, lon_min, lon_max in bounding_boxes(place.lat, place.lon, place.radius)
+            )),
+        )
+        result = await self.db.execute(query)
+
+        found = []
+        for item in result.scalars().all():
+            distance = haversine(place.lat, place.lon, item.lat, item.lon)
+            if distance <= place.radius and match_tags(tags, item.place_class, item.place_type):
+                found.append((distance, item))
+        found.sort(key=lambda pair: pair[0])
+
+        logger.debug(f'В локальном индексе найдено {len(found)} мест.')
+        return [
+            {
+                'place_id': item.place_id,
+                'lat': item.lat,
+                'lon': item.lon,
+                'display_name': item.display_name,
+                'name': item.name,
+                'class': item.place_class,
+                'type': item.place_type,
+                'distance': round(distance),
+            }
+            for distance, item in found[:place.limit]
+        ]
+
+    async def mark_covered(self, place: NearbyPlaceRequest, raw_data: list[dict]) -> None:
+        """
+        Отмечает ячейки, полностью покрытые ответом LocationIQ на запрос.
+        """
+        tags = place.normalized_tags()
+        if not is_supported_tags(tags):
+            return
+
+        radius = complete_radius(place, raw_data)
+        cells = cells_in_radius(place.lat, place.lon, radius,
+                                settings.nearby_cell_precision, settings.nearby_max_cells) or set()
+        covered = [cell for cell in cells if circle_contains_cell(place.lat, place.lon, radius, cell)]
+        if not covered:
+            return
+
+        try:
+            async with self.redis.pipeline(transaction=False) as pipe:
+                for cell in covered:
+                    pipe.set(self._coverage_key(tags, cell), 1, ex=settings.nearby_coverage_ttl)
+                await pipe.execute()
+        except RedisError as e:
+            logger.warning(f'Не удалось обновить покрытие локального индекса: {e}')
+            return
+        logger.debug(f'Отмечено {len(covered)} покрытых ячеек локального индекса.')
+
+    @staticmethod
+    def _coverage_key(tags: list[str], cell: str) -> str:
+        return f'{COVERAGE_PREFIX}:{",".join(tags)}:{cell}'
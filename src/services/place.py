@@ -1,33 +1,63 @@
+import asyncio
 import logging
+import time
 from abc import ABC
+from datetime import datetime
+from functools import partial
 from http import HTTPStatus
-from typing import Annotated
+from typing import Annotated, Awaitable, Callable
 from uuid import UUID
 
 from fastapi import Depends
 from httpx import AsyncClient, HTTPStatusError, RequestError
 from redis.asyncio import Redis
+from sqlalchemy import delete, func, literal, select, tuple_
+from sqlalchemy.dialects.postgresql import insert
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from core.cache import stale_while_revalidate
+from core.common import build_upstream_key, upstream_key_builder
 from core.config import settings
 from core.exceptions import ExternalServiceError
 from core.http import get_http_client
-from db.database import get_session
+from core.metrics import AUTOCOMPLETE_RESPONSES, LOCATIONIQ_REQUEST_DURATION, LOCATIONIQ_RESPONSES
+from core.pagination import decode_cursor, encode_cursor
+from core.ratelimit import PRIORITY_LOW, PRIORITY_NORMAL, UpstreamScheduler, get_locationiq_scheduler
+from core.singleflight import SingleFlight
+from db.database import async_session, get_session
 from db.redis import get_redis
-from models.places import Place, SearchHistory, FavoritePlace
+from models.places import Place, FavoritePlace, SearchHistory
 from schemas.places import (
+    AutocompleteRequest,
+    AutocompleteResponse,
+    FavoritePlaceBulkResponse,
+    PlaceDetails,
+    NearbyBatchItemResponse,
     NearbyPlaceRequest,
     NearbyPlaceResponse,
     SearchPlaceRequest,
     SearchPlaceResponse,
-    FavoritePlaceResponse
+    FavoritePlaceResponse,
+    SearchHistoryResponse,
 )
+from services.autocomplete import AutocompleteIndex, get_autocomplete_index
 from services.base_repository import BaseRepository
+from services.favorites_cache import FavoritesCache, get_favorites_cache
+from services.nearby_grid import GridCompleteness, answer_from_superset, may_answer_from_superset, quantize_request
+from services.nearby_index import NearbyPlaceIndex
+from services.search_history import SearchHistoryRepository, SearchHistoryWriter, get_search_history_writer
 
 logger = logging.getLogger(__name__)
 DatabaseDep = Annotated[AsyncSession, Depends(get_session)]
 RedisDep = Annotated[Redis, Depends(get_redis)]
 HttpClientDep = Annotated[AsyncClient, Depends(get_http_client)]
+SearchHistoryWriterDep = Annotated[SearchHistoryWriter | None, Depends(get_search_history_writer)]
+SchedulerDep = Annotated[UpstreamScheduler | None, Depends(get_locationiq_scheduler)]
+FavoritesCacheDep = Annotated[FavoritesCache, Depends(get_favorites_cache)]
+AutocompleteIndexDep = Annotated[AutocompleteIndex | None, Depends(get_autocomplete_index)]
+
+# Общий для процесса слой объединения одинаковых одновременных запросов к LocationIQ.
+locationiq_flight = SingleFlight()
 
 
 class PlaceServiceABC(ABC):
@@ -37,10 +67,26 @@ class PlaceServiceABC(ABC):
     async def get_nearby_places(self, place: NearbyPlaceRequest, user_id: UUID | None) -> list[NearbyPlaceResponse]:
         pass
 
-    async def get_favorite_places(self, user_id: UUID) -> list[FavoritePlaceResponse] | None:
+    async def autocomplete(self, place: AutocompleteRequest) -> list[AutocompleteResponse]:
+        pass
+
+    async def get_nearby_places_batch(self, places: list[NearbyPlaceRequest],
+                                      user_id: UUID | None) -> list[NearbyBatchItemResponse]:
+        pass
+
+    async def get_favorite_places(self, user_id: UUID, limit: int = 100,
+                                  cursor: str | None = None) -> tuple[list[FavoritePlaceResponse], str | None]:
+        pass
+
+    async def save_favorite_place(self, place_id: str, user_id: UUID) -> FavoritePlaceResponse | None:
+        pass
+
+    async def get_search_history(self, user_id: UUID, limit: int = 100,
+                                 cursor: str | None = None) -> tuple[list[SearchHistoryResponse], str | None]:
         pass
 
-    async def save_favorite_place(self, place: Place, user_id: UUID) -> FavoritePlaceResponse | None:
+    async def update_favorite_places(self, add: list[str], remove: list[str],
+                                     user_id: UUID) -> FavoritePlaceBulkResponse | None:
         pass
 
     async def delete_favorite_place(self, place_id: str, user_id: UUID) -> bool:
@@ -51,115 +97,458 @@ class PlaceServiceABC(ABC):
 
 
 class PlaceService(BaseRepository, PlaceServiceABC):
-    def __init__(self, db: AsyncSession, redis: Redis, client: AsyncClient):
+    def __init__(self, db: AsyncSession, redis: Redis, client: AsyncClient,
+                 history_writer: SearchHistoryWriter | None = None, scheduler: UpstreamScheduler | None = None,
+                 favorites_cache: FavoritesCache | None = None, autocomplete_index: AutocompleteIndex | None = None):
         super().__init__(db)
         self.redis = redis
         self.client = client
+        self.history_writer = history_writer
+        self.scheduler = scheduler
+        self.favorites_cache = favorites_cache
+        self.autocomplete_index = autocomplete_index
+        self.nearby_index = NearbyPlaceIndex(db, redis)
 
     async def search_places(self, place: SearchPlaceRequest, user_id: UUID | None) -> list[SearchPlaceResponse]:
         """
         Выполняет поиск мест по названию.
+        У LocationIQ всегда запрашивается максимальное число результатов, а пользователю
+        отдаются первые limit из них, поэтому запросы с разным limit используют одну запись в кэше.
         """
-        params = place.to_params(settings.locationiq_api_key)
+        params = place.to_params(self._default_api_key(), limit=settings.locationiq_search_limit)
         data = await self._fetch_places(settings.LOCATIONIQ_SEARCH_URL, params=params)
-        return await self._validate_and_save_places(data, SearchPlaceResponse, user_id)
+        return await self._validate_and_save_places(data[:place.limit], SearchPlaceResponse, user_id)
+
+    async def autocomplete(self, place: AutocompleteRequest) -> list[AutocompleteResponse]:
+        """
+        Подсказки мест по началу названия.
+        Если в локальном индексе меньше limit подходящих мест, они дополняются ответом LocationIQ.
+        Подсказки не попадают в историю поиска, а найденные у LocationIQ места сохраняются и пополняют индекс.
+        """
+        local = await self.autocomplete_index.find(place.query, place.limit) if self.autocomplete_index else []
+        if len(local) >= place.limit:
+            AUTOCOMPLETE_RESPONSES.labels('local').inc()
+            return [AutocompleteResponse.model_validate(item) for item in local]
+
+        params = place.to_params(self._default_api_key(), limit=settings.locationiq_autocomplete_limit)
+        try:
+            data = await self._fetch_places(settings.LOCATIONIQ_AUTOCOMPLETE_URL, params=params)
+        except ExternalServiceError as e:
+            if not local:
+                raise
+            logger.warning(f'Автодополнение отдано только из локального индекса: {e.message}')
+            AUTOCOMPLETE_RESPONSES.labels('local').inc()
+            return [AutocompleteResponse.model_validate(item) for item in local]
+
+        AUTOCOMPLETE_RESPONSES.labels('upstream').inc()
+        local_ids = {item['place_id'] for item in local}
+        upstream = [item for item in data if str(item.get('place_id')) not in local_ids][:place.limit - len(local)]
+        found = await self._validate_and_save_places(upstream, AutocompleteResponse, None)
+        return [AutocompleteResponse.model_validate(item) for item in local] + found
 
     async def get_nearby_places(self, place: NearbyPlaceRequest, user_id: UUID | None) -> list[NearbyPlaceResponse]:
         """
         Выполняет поиск ближайших мест по координатам.
+        Если область полностью покрыта локальным индексом, запрос к LocationIQ не выполняется.
+        Иначе ответ строится по общему запросу ячейки сетки, а при его неполноте - по точному запросу;
+        если неполнота общего запроса известна заранее, выполняется только точный запрос.
+        """
+        if settings.nearby_index_enabled and (local_data := await self.nearby_index.find(place)) is not None:
+            logger.info('Ближайшие места получены из локального индекса.')
+            return await self._validate_and_save_places(local_data, NearbyPlaceResponse, user_id)
+
+        request, data, answer = place, None, None
+        if settings.nearby_grid_enabled:
+            # Один общий запрос на ячейку сетки: соседние точки используют одну запись в кэше.
+            # Если заранее известно, что он не ответит, сразу выполняется точный запрос.
+            superset = quantize_request(place, settings.nearby_grid_precision, settings.nearby_grid_limit)
+            grid_completeness = GridCompleteness(self.redis, settings.nearby_coverage_ttl)
+            if may_answer_from_superset(place, superset, await grid_completeness.get(superset)):
+                request = superset
+                data = await self._fetch_places(settings.LOCATIONIQ_NEARBY_URL,
+                                                params=superset.to_params(self._default_api_key()))
+                if (answer := answer_from_superset(place, superset, data)) is None:
+                    await grid_completeness.remember(superset, data)
+        if answer is None:
+            request = place
+            data = await self._fetch_places(settings.LOCATIONIQ_NEARBY_URL,
+                                            params=place.to_params(self._default_api_key()))
+            answer = data
+        # Покрытие отмечается только после того, как найденные места записаны в базу.
+        mark_covered = partial(self.nearby_index.mark_covered, request, data) if settings.nearby_index_enabled else None
+        return await self._validate_and_save_places(answer, NearbyPlaceResponse, user_id, after_save=mark_covered)
+
+    async def get_nearby_places_batch(self, places: list[NearbyPlaceRequest],
+                                      user_id: UUID | None) -> list[NearbyBatchItemResponse]:
+        """
+        Выполняет поиск ближайших мест для нескольких точек.
+        Одинаковые запросы выполняются один раз, остальные - параллельно, не больше nearby_batch_concurrency
+        одновременно; соседние точки разделяют общий запрос ячейки сетки и кэш. Ошибка одной точки
+        возвращается в ее элементе ответа и не влияет на остальные.
         """
-        params = place.to_params(settings.locationiq_api_key)
-        data = await self._fetch_places(settings.LOCATIONIQ_NEARBY_URL, params=params)
-        return await self._validate_and_save_places(data, NearbyPlaceResponse, user_id)
+        semaphore = asyncio.Semaphore(settings.nearby_batch_concurrency)
+        unique: dict[tuple, NearbyPlaceRequest] = {}
+        for place in places:
+            unique.setdefault(self._nearby_key(place), place)
+
+        async def run(place: NearbyPlaceRequest) -> NearbyBatchItemResponse:
+            async with semaphore:
+                try:
+                    # У каждой точки своя сессия: одну сессию нельзя использовать из нескольких задач.
+                    async with async_session() as session:
+                        service = PlaceService(session, self.redis, self.client, self.history_writer,
+                                               self.scheduler, autocomplete_index=self.autocomplete_index)
+                        found = await service.get_nearby_places(place, user_id)
+                except ExternalServiceError as e:
+                    return NearbyBatchItemResponse(status_code=e.status_code, detail=e.message)
+                except Exception as e:
+                    logger.error(f'Ошибка поиска ближайших мест в пакетном запросе: {e}')
+                    return NearbyBatchItemResponse(status_code=HTTPStatus.INTERNAL_SERVER_ERROR,
+                                                   detail='Internal server error')
+            if not found:
+                return NearbyBatchItemResponse(status_code=HTTPStatus.NOT_FOUND, detail='Places not found')
+            return NearbyBatchItemResponse(status_code=HTTPStatus.OK, places=found)
 
-    async def get_favorite_places(self, user_id: UUID) -> list[FavoritePlaceResponse] | None:
+        results = dict(zip(unique, await asyncio.gather(*(run(place) for place in unique.values()))))
+        logger.info(f'Пакетный поиск ближайших мест: точек {len(places)}, уникальных {len(unique)}.')
+        return [results[self._nearby_key(place)] for place in places]
+
+    async def get_favorite_places(self, user_id: UUID, limit: int = 100,
+                                  cursor: str | None = None) -> tuple[list[FavoritePlaceResponse], str | None]:
         """
-        Получает список избранных мест для указанного пользователя.
+        Получает страницу избранных мест пользователя вместе с данными мест, от новых к старым.
+        Возвращает места и курсор следующей страницы (None, если страница последняя).
+        Страница берется из кэша избранного без обращения к базе, если она там есть.
+        При некорректном курсоре выбрасывает ValueError.
         """
-        favorite_places = await self._execute_query(FavoritePlace, FavoritePlace.user_id == user_id,
-                                                    return_first=False)
+        version = None
+        if self.favorites_cache:
+            version, page = await self.favorites_cache.get(user_id, limit, cursor)
+            if page is not None:
+                logger.debug('Список избранных мест получен из кэша.')
+                return page
+
+        favorite_places, next_cursor = await self._query_favorite_places(user_id, limit, cursor)
+        if self.favorites_cache and version is not None:
+            await self.favorites_cache.set(user_id, version, limit, cursor, favorite_places, next_cursor)
+        return favorite_places, next_cursor
+
+    async def _query_favorite_places(self, user_id: UUID, limit: int,
+                                     cursor: str | None) -> tuple[list[FavoritePlaceResponse], str | None]:
+        query = (
+            select(FavoritePlace, Place)
+            .join(Place, Place.place_id == FavoritePlace.place_id)
+            .filter(FavoritePlace.user_id == user_id)
+            .order_by(FavoritePlace.created_at.desc(), FavoritePlace.id.desc())
+            .limit(limit + 1)
+        )
+        if cursor:
+            created_at, favorite_id = decode_cursor(cursor)
+            query = query.filter(tuple_(FavoritePlace.created_at, FavoritePlace.id) < tuple_(created_at, favorite_id))
+        rows = (await self.db.execute(query)).all()
+
+        next_cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            last = rows[-1].FavoritePlace
+            next_cursor = encode_cursor(last.created_at, last.id)
+
+        favorite_places = [
+            FavoritePlaceResponse(
+                id=favorite.id,
+                user_id=favorite.user_id,
+                place_id=favorite.place_id,
+                created_at=favorite.created_at,
+                place=self._place_details(place),
+            )
+            for favorite, place in rows
+        ]
         logger.info('Пользователь получил список избранных мест.' if favorite_places else 'Список избранных мест пуст.')
-        return favorite_places
+        return favorite_places, next_cursor
 
-    async def save_favorite_place(self, place: Place, user_id: UUID) -> FavoritePlaceResponse | None:
+    async def get_search_history(self, user_id: UUID, limit: int = 100,
+                                 cursor: str | None = None) -> tuple[list[SearchHistoryResponse], str | None]:
         """
-        Сохраняет выбранное место в избранное пользователя.
+        Получает страницу истории поиска пользователя вместе с данными мест, от новых записей к старым.
+        Возвращает записи и курсор следующей страницы (None, если страница последняя).
+        При некорректном курсоре выбрасывает ValueError.
         """
-        if saved_favorite := await self._save_entities([FavoritePlace(user_id=user_id, place_id=place.place_id)]):
+        if self.history_writer:
+            # Недавние поиски пользователя могут быть еще в буфере отложенной записи.
+            await self.history_writer.flush_pending(user_id=user_id)
+
+        query = (
+            select(SearchHistory, Place)
+            .join(Place, Place.place_id == SearchHistory.place_id)
+            .filter(SearchHistory.user_id == user_id)
+            .order_by(SearchHistory.search_date.desc(), SearchHistory.id.desc())
+            .limit(limit + 1)
+        )
+        if cursor:
+            search_date, history_id = decode_cursor(cursor)
+            query = query.filter(
+                tuple_(SearchHistory.search_date, SearchHistory.id) < tuple_(search_date, history_id),
+                # Условие по ключу секционирования исключает из плана секции новее курсора.
+                SearchHistory.search_month <= SearchHistory.month_of(search_date),
+            )
+        rows = (await self.db.execute(query)).all()
+
+        next_cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            last = rows[-1].SearchHistory
+            next_cursor = encode_cursor(last.search_date, last.id)
+
+        history = [
+            SearchHistoryResponse(
+                id=item.id,
+                place_id=item.place_id,
+                search_date=item.search_date,
+                place=self._place_details(place),
+            )
+            for item, place in rows
+        ]
+        logger.info('Пользователь получил историю поиска.' if history else 'История поиска пуста.')
+        return history, next_cursor
+
+    @staticmethod
+    def _place_details(place: Place) -> PlaceDetails:
+        return PlaceDetails.model_validate({
+            'place_id': place.place_id,
+            'lat': place.lat,
+            'lon': place.lon,
+            'display_name': place.display_name,
+            'name': place.name,
+            'class': place.place_class,
+            'type': place.place_type,
+        })
+
+    async def save_favorite_place(self, place_id: str, user_id: UUID) -> FavoritePlaceResponse | None:
+        """
+        Сохраняет место в избранное пользователя одним запросом INSERT ... SELECT ... ON CONFLICT DO NOTHING.
+        Возвращает None, если места нет в базе или оно уже есть в избранном.
+        """
+        if self.history_writer:
+            # Место могло быть найдено недавно и еще не записано отложенной записью.
+            await self.history_writer.flush_pending([place_id])
+
+        if (saved := await self._insert_favorites(user_id, [place_id])) is None:
+            return None
+        if saved:
             logger.info('Место успешно добавлено в избранное.')
-            return saved_favorite
+            await self._invalidate_favorites(user_id)
+            return saved[0]
 
-        logger.error('Данные уже существуют в избранном.')
+        logger.error('Место не найдено или уже есть в избранном.')
         return None
 
-    async def delete_favorite_place(self, place_id: str, user_id: UUID) -> bool:
+    async def update_favorite_places(self, add: list[str], remove: list[str],
+                                     user_id: UUID) -> FavoritePlaceBulkResponse | None:
         """
-        Удаляет указанное место из избранного пользователя.
+        Добавляет и удаляет места избранного пользователя в одной транзакции: одним запросом на добавление
+        и одним на удаление. Места, которых нет в базе или которые уже есть в избранном, пропускаются.
+        Возвращает None при ошибке базы данных.
         """
-        favorite_place = await self._execute_query(FavoritePlace, FavoritePlace.user_id == user_id,
-                                                   FavoritePlace.place_id == place_id, return_first=True)
+        add, remove = list(dict.fromkeys(add)), list(dict.fromkeys(remove))
+        if self.history_writer:
+            await self.history_writer.flush_pending(add)
 
-        if favorite_place:
-            return await self._delete_entity(favorite_place)
+        try:
+            added = await self._insert_favorites(user_id, add, commit=False) if add else []
+            removed = await self._delete_favorites(user_id, remove, commit=False) if remove else []
+            await self.db.commit()
+        except Exception as e:
+            await self.db.rollback()
+            logger.error(f'Ошибка при пакетном изменении избранного: {e}')
+            return None
+
+        added_ids = {favorite.place_id for favorite in added}
+        if added or removed:
+            await self._invalidate_favorites(user_id)
+        logger.info(f'Избранное пользователя изменено: добавлено {len(added)}, удалено {len(removed)}.')
+        return FavoritePlaceBulkResponse(
+            added=[place_id for place_id in add if place_id in added_ids],
+            removed=removed,
+            skipped=[place_id for place_id in add if place_id not in added_ids],
+        )
+
+    async def delete_favorite_place(self, place_id: str, user_id: UUID) -> bool:
+        """
+        Удаляет указанное место из избранного пользователя одним запросом DELETE ... RETURNING.
+        """
+        if await self._delete_favorites(user_id, [place_id]):
+            await self._invalidate_favorites(user_id)
+            return True
         logger.warning(f'Не удалось удалить место {place_id} из избранного пользователя {user_id}.')
         return False
 
+    async def _insert_favorites(self, user_id: UUID, place_ids: list[str],
+                                commit: bool = True) -> list[FavoritePlace] | None:
+        """
+        Добавляет в избранное места из places с указанными ID и возвращает добавленные записи.
+        При commit=False ошибки не обрабатываются, а транзакцию завершает вызывающий.
+        """
+        places = select(
+            func.gen_random_uuid(),
+            literal(user_id, FavoritePlace.user_id.type),
+            Place.place_id,
+            literal(datetime.utcnow(), FavoritePlace.created_at.type),
+        ).filter(Place.place_id.in_(place_ids))
+        query = (
+            insert(FavoritePlace)
+            .from_select(['id', 'user_id', 'place_id', 'created_at'], places)
+            .on_conflict_do_nothing(index_elements=['user_id', 'place_id'])
+            .returning(FavoritePlace)
+        )
+        if not commit:
+            return list((await self.db.execute(query)).scalars().all())
+        try:
+            favorites = list((await self.db.execute(query)).scalars().all())
+            await self.db.commit()
+            return favorites
+        except Exception as e:
+            await self.db.rollback()
+            logger.error(f'Ошибка при добавлении в избранное: {e}')
+            return None
+
+    async def _delete_favorites(self, user_id: UUID, place_ids: list[str], commit: bool = True) -> list[str]:
+        """
+        Удаляет места из избранного пользователя и возвращает ID удаленных мест.
+        При commit=False ошибки не обрабатываются, а транзакцию завершает вызывающий.
+        """
+        query = (
+            delete(FavoritePlace)
+            .filter(FavoritePlace.user_id == user_id, FavoritePlace.place_id.in_(place_ids))
+            .returning(FavoritePlace.place_id)
+        )
+        if not commit:
+            return list((await self.db.execute(query)).scalars().all())
+        try:
+            deleted = list((await self.db.execute(query)).scalars().all())
+            await self.db.commit()
+            return deleted
+        except Exception as e:
+            await self.db.rollback()
+            logger.error(f'Ошибка при удалении из избранного: {e}')
+            return []
+
     async def get_place_by_id(self, place_id: str) -> Place | None:
         """
         Получает место по ID.
         """
-        if place := await self._execute_query(Place, Place.place_id == place_id):
+        place = await self._execute_query(Place, Place.place_id == place_id)
+        if place is None and self.history_writer:
+            # Место могло быть найдено недавно и еще не записано отложенной записью.
+            await self.history_writer.flush_pending([place_id])
+            place = await self._execute_query(Place, Place.place_id == place_id)
+
+        if place:
             logger.debug(f'Место с ID \'{place_id}\' найдено.')
             return place
 
         logger.warning(f'Место с ID \'{place_id}\' не найдено.')
         return None
 
-    async def _fetch_places(self, url: str, params: dict) -> list[dict]:
+    @stale_while_revalidate(
+        expire=settings.redis_ttl,
+        grace=settings.cache_stale_grace,
+        namespace='locationiq',
+        key_builder=upstream_key_builder,
+        lock_timeout=settings.cache_lock_timeout,
+        lock_wait=settings.cache_lock_wait,
+        refresh_kwargs={'priority': PRIORITY_LOW},
+    )
+    async def _fetch_places(self, url: str, params: dict, priority: int = PRIORITY_NORMAL) -> list[dict]:
         """
         Выполняет запрос к API LocationIQ и возвращает данные в формате JSON.
+        Результат кэшируется и разделяется между всеми пользователями; устаревший результат
+        обновляется в фоне с низким приоритетом.
+        """
+        return await locationiq_flight.do(build_upstream_key(url, params),
+                                          self._request_places, url, params, priority)
+
+    async def _request_places(self, url: str, params: dict, priority: int = PRIORITY_NORMAL) -> list[dict]:
         """
+        Выполняет HTTP-запрос к API LocationIQ.
+        Одновременные одинаковые запросы объединяются в один через locationiq_flight,
+        а ключ API выдает планировщик с учетом лимитов.
+        """
+        if self.scheduler:
+            params = {**params, 'key': await self.scheduler.acquire(priority)}
+        endpoint = url.rstrip('/').rsplit('/', 1)[-1]
+        started = time.perf_counter()
         try:
             response = await self.client.get(url, params=params)
+        except RequestError as e:
+            LOCATIONIQ_RESPONSES.labels(endpoint, 'error').inc()
+            raise ExternalServiceError(
+                status_code=HTTPStatus.SERVICE_UNAVAILABLE,
+                message='LocationIQ временно недоступен'
+            ) from e
+        finally:
+            LOCATIONIQ_REQUEST_DURATION.labels(endpoint).observe(time.perf_counter() - started)
+
+        LOCATIONIQ_RESPONSES.labels(endpoint, response.status_code).inc()
+        try:
             response.raise_for_status()
         except HTTPStatusError as e:
             raise ExternalServiceError(
                 status_code=e.response.status_code,
                 message=f'Ошибка LocationIQ: {e.response.text}'
             ) from e
-        except RequestError as e:
-            raise ExternalServiceError(
-                status_code=HTTPStatus.SERVICE_UNAVAILABLE,
-                message='LocationIQ временно недоступен'
-            ) from e
         logger.info('Запрос к API LocationIQ выполнен успешно.')
         return response.json()
 
+    async def _invalidate_favorites(self, user_id: UUID) -> None:
+        if self.favorites_cache:
+            await self.favorites_cache.invalidate(user_id)
+
+    @staticmethod
+    def _nearby_key(place: NearbyPlaceRequest) -> tuple:
+        return place.lat, place.lon, tuple(place.normalized_tags()), place.radius, place.limit
+
+    @staticmethod
+    def _default_api_key() -> str:
+        return next(iter(settings.LOCATIONIQ_API_KEYS), '')
+
     async def _validate_and_save_places(self, raw_data: list[dict],
-                                        model: type[NearbyPlaceResponse | SearchPlaceResponse],
+                                        model: type[NearbyPlaceResponse | SearchPlaceResponse | AutocompleteResponse],
                                         user_id: UUID | None,
-                                        ) -> list[SearchPlaceResponse | NearbyPlaceResponse]:
+                                        after_save: Callable[[], Awaitable[None]] | None = None,
+                                        ) -> list[SearchPlaceResponse | NearbyPlaceResponse | AutocompleteResponse]:
         """
         Валидирует данные, полученные из API, и сохраняет их в базу данных.
+        При запущенной отложенной записи строки ставятся в ее очередь, а не пишутся сразу.
+        after_save выполняется только после успешной записи.
         """
         validated_items = [model.model_validate(item) for item in raw_data]
 
-        places_to_save: list[Place] = []
-        history_to_save: list[SearchHistory] = []
-
-        for item in validated_items:
-            places_to_save.append(Place.from_schema(item))
-            if user_id:
-                history_to_save.append(SearchHistory(user_id=user_id,
-                                                     place_id=item.place_id))
-        if saved_places := await self._save_entities(places_to_save):
-            logger.info(f'Успешно добавлено {len(saved_places)} мест в базу данных.')
+        place_rows = [Place.values_from_schema(item) for item in validated_items]
+        history_rows: list[dict] = []
+        if user_id:
+            search_date = datetime.utcnow()
+            search_month = SearchHistory.month_of(search_date)
+            history_rows = [{'user_id': user_id, 'place_id': item.place_id,
+                             'search_date': search_date, 'search_month': search_month}
+                            for item in validated_items]
 
-        if saved_history := await self._save_entities(history_to_save):
-            logger.info(f'В историю поиска пользователя {user_id} успешно добавлено {len(saved_history)} записей.')
+        if self.history_writer:
+            await self.history_writer.enqueue(place_rows, history_rows)
+            if after_save:
+                self.history_writer.after_flush(after_save)
+        else:
+            try:
+                await SearchHistoryRepository(self.db, self.autocomplete_index).save(place_rows, history_rows)
+            except Exception as e:
+                logger.error(f'Не удалось сохранить найденные места и историю поиска: {e}')
+            else:
+                if after_save:
+                    await after_save()
 
         return validated_items
 
 
-def get_place_service(db: DatabaseDep, redis: RedisDep, client: HttpClientDep) -> PlaceServiceABC:
-    return PlaceService(db, redis, client)
+def get_place_service(db: DatabaseDep, redis: RedisDep, client: HttpClientDep,
+                      history_writer: SearchHistoryWriterDep, scheduler: SchedulerDep,
+                      favorites_cache: FavoritesCacheDep, autocomplete_index: AutocompleteIndexDep) -> PlaceServiceABC:
+    return PlaceService(db, redis, client, history_writer, scheduler, favorites_cache, autocomplete_index)
@@ -0,0 +1,381 @@
+import asyncio
+import logging
+from datetime import date, datetime
+from typing import Awaitable, Callable, Iterable
+from uuid import UUID
+
+from sqlalchemy import text
+from sqlalchemy.exc import DataError, IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from db.database import async_session
+from models.places import HISTORY_PARTITION_PREFIX, Place, SearchHistory
+from services.autocomplete import AutocompleteIndex
+from services.base_repository import BaseRepository
+
+logger = logging.getLogger(__name__)
+
+
+class SearchHistoryRepository(BaseRepository):
+    def __init__(self, db: AsyncSession, autocomplete_index: AutocompleteIndex | None = None):
+        super().__init__(db)
+        self.autocomplete_index = autocomplete_index
+
+    async def save(self, place_rows: list[dict], history_rows: list[dict]) -> None:
+        """
+        Сохраняет найденные места и историю поиска пакетными запросами.
+        Новые места добавляются в индекс автодополнения.
+        """
+        # Ячейка geohash заполняется и для мест, сохраненных до появления локального индекса.
+        if saved_places := await self._upsert_entities(Place, place_rows, index_elements=['place_id'],
+                                                       update_fields=['cell', 'name'],
+                                                       update_where=Place.cell.is_(None)):
+            logger.info(f'Успешно добавлено {len(saved_places)} мест в базу данных.')
+            if self.autocomplete_index:
+                await self.autocomplete_index.add(saved_places)
+
+        if saved_history := await self._upsert_entities(SearchHistory, history_rows,
+                                                        index_elements=['user_id', 'place_id', 'search_month'],
+                                                        update_fields=['search_date']):
+            logger.info(f'В историю поиска успешно добавлено {len(saved_history)} записей.')
+
+
+class SearchHistoryWriter:
+    """
+    Отложенная запись мест и истории поиска.
+
+    Строки накапливаются в памяти без дубликатов и сбрасываются в базу пачками
+    фоновой задачей: по достижении batch_size или раз в flush_interval секунд.
+    Если в буфере max_pending строк, добавление ждет освобождения места не дольше enqueue_timeout секунд,
+    после чего строки истории отбрасываются, а места все равно добавляются в буфер.
+    Строки, которые не удалось записать, возвращаются в буфер, и сброс повторяется через flush_interval.
+    После max_attempts неудачных сбросов подряд пачки, отклоненные базой из-за данных (IntegrityError,
+    DataError), делятся пополам до отдельных строк, и такие строки отбрасываются.
+    """
+
+    def __init__(self, batch_size: int, flush_interval: float, max_pending: int,
+                 enqueue_timeout: float, max_attempts: int,
+                 autocomplete_index: AutocompleteIndex | None = None):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self.enqueue_timeout = enqueue_timeout
+        self.max_attempts = max_attempts
+        self.autocomplete_index = autocomplete_index
+        self._places: dict[str, dict] = {}
+        self._history: dict[tuple[UUID, str], dict] = {}
+        self._after_flush: list[Callable[[], Awaitable[None]]] = []
+        self._flush_requested = asyncio.Event()
+        self._space_available = asyncio.Event()
+        self._space_available.set()
+        self._flush_lock = asyncio.Lock()
+        self._inflight: list[tuple[set[str], set[UUID], asyncio.Event]] = []
+        self._task: asyncio.Task | None = None
+        self._closed = False
+        self._failed_attempts = 0
+        self.flushed_rows = 0
+        self.failed_flushes = 0
+        self.rejected_rows = 0
+        self.overflow_rows = 0
+
+    @property
+    def pending(self) -> int:
+        return len(self._places) + len(self._history)
+
+    def stats(self) -> dict[str, int]:
+        return {
+            'pending': self.pending,
+            'flushed_rows': self.flushed_rows,
+            'failed_flushes': self.failed_flushes,
+            'rejected_rows': self.rejected_rows,
+            'overflow_rows': self.overflow_rows,
+        }
+
+    def start(self) -> None:
+        self._task = asyncio.create_task(self._run())
+        logger.info('Отложенная запись истории поиска запущена.')
+
+    async def stop(self) -> None:
+        """
+        Останавливает фоновую задачу и сбрасывает в базу все накопленные строки.
+        """
+        self._closed = True
+        self._flush_requested.set()
+        if self._task:
+            await self._task
+        try:
+            await self.flush()
+        except Exception as e:
+            logger.error(f'Не удалось записать историю поиска при остановке (потеряно строк: {self.pending}): {e}')
+        logger.info(f'Отложенная запись истории поиска остановлена (записано строк: {self.flushed_rows}).')
+
+    async def enqueue(self, place_rows: list[dict], history_rows: list[dict]) -> None:
+        """
+        Добавляет строки в буфер. При переполнении буфера ожидает очередного сброса,
+        но не дольше enqueue_timeout: запрос пользователя не должен зависеть от доступности базы.
+        """
+        if self.pending >= self.max_pending:
+            try:
+                await asyncio.wait_for(self._wait_for_space(), timeout=self.enqueue_timeout)
+            except asyncio.TimeoutError:
+                self.overflow_rows += len(history_rows)
+                logger.warning(f'Буфер истории поиска переполнен, строки истории отброшены: {len(history_rows)}.')
+                history_rows = []
+
+        for row in place_rows:
+            self._places[row['place_id']] = row
+        for row in history_rows:
+            self._history[(row['user_id'], row['place_id'])] = row
+
+        if self.pending >= self.batch_size:
+            self._flush_requested.set()
+
+    def after_flush(self, callback: Callable[[], Awaitable[None]]) -> None:
+        """
+        Регистрирует действие, которое выполнится после успешной записи уже добавленных в буфер строк.
+        Если запись не удалась, действие ждет повторной записи вместе со строками.
+        """
+        self._after_flush.append(callback)
+
+    async def flush_pending(self, place_ids: Iterable[str] = (), user_id: UUID | None = None) -> None:
+        """
+        Записывает только строки, от которых зависит запрос: места place_ids и историю поиска пользователя
+        user_id вместе с местами, на которые она ссылается. Если эти строки уже записывает другой сброс,
+        дожидается его. Ошибка записи не прерывает запрос: строки остаются в буфере для повторной записи.
+        """
+        place_ids = set(place_ids)
+        await self._wait_inflight(place_ids, user_id)
+
+        history = [row for key, row in self._history.items() if key[0] == user_id] if user_id else []
+        place_ids.update(row['place_id'] for row in history)
+        places = [self._places[place_id] for place_id in place_ids if place_id in self._places]
+        if not places and not history:
+            return
+        for row in places:
+            del self._places[row['place_id']]
+        for row in history:
+            del self._history[(row['user_id'], row['place_id'])]
+        try:
+            await self._write(places, history, isolate=False)
+        except Exception as e:
+            logger.warning(f'Не удалось записать ожидающие строки истории поиска, чтение без них: {e}')
+
+    async def flush(self) -> None:
+        """
+        Сбрасывает накопленные строки в базу данных.
+        При ошибке незаписанные строки и действия после записи возвращаются в буфер,
+        а исключение пробрасывается.
+        """
+        async with self._flush_lock:
+            places, self._places = list(self._places.values()), {}
+            history, self._history = list(self._history.values()), {}
+            callbacks, self._after_flush = self._after_flush, []
+            if not places and not history and not callbacks:
+                return
+            try:
+                await self._write(places, history, isolate=self._failed_attempts >= self.max_attempts)
+            except Exception:
+                self._failed_attempts += 1
+                self.failed_flushes += 1
+                self._after_flush = callbacks + self._after_flush
+                raise
+            self._failed_attempts = 0
+
+            # Строки, добавленные до регистрации действий, могут еще записываться через flush_pending.
+            await self._wait_inflight(None, None)
+            for callback in callbacks:
+                try:
+                    await callback()
+                except Exception as e:
+                    logger.error(f'Ошибка при выполнении действия после записи истории поиска: {e}')
+
+    async def _write(self, places: list[dict], history: list[dict], isolate: bool) -> None:
+        """
+        Записывает строки пачками по batch_size. Пока идет запись, строки считаются записываемыми
+        (_wait_inflight), а при ошибке незаписанные строки возвращаются в буфер и исключение пробрасывается.
+        """
+        done = asyncio.Event()
+        inflight = ({row['place_id'] for row in places}, {row['user_id'] for row in history}, done)
+        self._inflight.append(inflight)
+        unsaved_places, unsaved_history = places, history
+        rejected_before = self.rejected_rows
+        try:
+            async with async_session() as session:
+                repository = SearchHistoryRepository(session, self.autocomplete_index)
+                # Места пишутся раньше истории, так как история ссылается на них внешним ключом.
+                while unsaved_places:
+                    await self._save(repository, unsaved_places[:self.batch_size], [], isolate)
+                    unsaved_places = unsaved_places[self.batch_size:]
+                while unsaved_history:
+                    await self._save(repository, [], unsaved_history[:self.batch_size], isolate)
+                    unsaved_history = unsaved_history[self.batch_size:]
+        except Exception:
+            self._requeue(unsaved_places, unsaved_history)
+            raise
+        finally:
+            self.flushed_rows += (len(places) - len(unsaved_places) + len(history) - len(unsaved_history)
+                                  - (self.rejected_rows - rejected_before))
+            self._inflight.remove(inflight)
+            done.set()
+            self._space_available.set()
+
+    async def _wait_inflight(self, place_ids: set[str] | None, user_id: UUID | None) -> None:
+        """
+        Ждет завершения записей, в которых участвуют места place_ids или история пользователя user_id
+        (если оба None - всех текущих записей).
+        """
+        for places, users, done in list(self._inflight):
+            if (place_ids is None and user_id is None) or places & (place_ids or set()) or user_id in users:
+                await done.wait()
+
+    async def _save(self, repository: SearchHistoryRepository, place_rows: list[dict], history_rows: list[dict],
+                    isolate: bool) -> None:
+        """
+        Записывает пачку. В режиме isolate пачка, отклоненная из-за данных, делится пополам,
+        пока не останется одна строка; такая строка отбрасывается. Прочие ошибки пробрасываются.
+        """
+        try:
+            await repository.save(place_rows, history_rows)
+        except (IntegrityError, DataError) as e:
+            if not isolate:
+                raise
+            rows = place_rows or history_rows
+            if len(rows) == 1:
+                self.rejected_rows += 1
+                logger.error(f'Строка истории поиска отброшена после {self.max_attempts} неудачных сбросов: '
+                             f'{rows[0]} ({e})')
+                return
+            middle = len(rows) // 2
+            for part in (rows[:middle], rows[middle:]):
+                if place_rows:
+                    await self._save(repository, part, [], isolate)
+                else:
+                    await self._save(repository, [], part, isolate)
+
+    async def _wait_for_space(self) -> None:
+        while self.pending >= self.max_pending and not self._closed:
+            self._space_available.clear()
+            self._flush_requested.set()
+            await self._space_available.wait()
+
+    def _requeue(self, place_rows: list[dict], history_rows: list[dict]) -> None:
+        """
+        Возвращает незаписанные строки в буфер. Строки, добавленные во время записи, новее и остаются.
+        """
+        self._places = {**{row['place_id']: row for row in place_rows}, **self._places}
+        self._history = {**{(row['user_id'], row['place_id']): row for row in history_rows}, **self._history}
+        logger.warning(f'Строки истории поиска возвращены в буфер для повторной записи: '
+                       f'{len(place_rows) + len(history_rows)}.')
+
+    async def _run(self) -> None:
+        while not self._closed:
+            try:
+                await asyncio.wait_for(self._flush_requested.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._flush_requested.clear()
+            try:
+                await self.flush()
+            except Exception as e:
+                logger.error(f'Ошибка при отложенной записи истории поиска: {e}')
+                # Повтор не раньше чем через flush_interval, чтобы не нагружать недоступную базу.
+                await asyncio.sleep(self.flush_interval)
+
+
+class SearchHistoryMaintenance:
+    """
+    Обслуживание секций истории поиска.
+
+    Раз в interval секунд создает секции на months_ahead месяцев вперед и удаляет секции старше
+    retention_months месяцев (0 - хранить всю историю). Удаление секции целиком не оставляет
+    мертвых строк и не требует VACUUM, в отличие от DELETE. Из нескольких воркеров обслуживание
+    выполняет тот, кто захватил advisory-блокировку.
+    """
+
+    LOCK_KEY = 7_245_119
+
+    def __init__(self, months_ahead: int, retention_months: int, interval: float):
+        self.months_ahead = months_ahead
+        self.retention_months = retention_months
+        self.interval = interval
+        self._task: asyncio.Task | None = None
+        self.partitions_created = 0
+        self.partitions_dropped = 0
+
+    def stats(self) -> dict[str, int]:
+        return {'partitions_created': self.partitions_created, 'partitions_dropped': self.partitions_dropped}
+
+    def start(self) -> None:
+        self._task = asyncio.create_task(self._run())
+        logger.info('Обслуживание секций истории поиска запущено.')
+
+    async def stop(self) -> None:
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+
+    async def run_once(self) -> None:
+        current = SearchHistory.month_of(datetime.utcnow())
+        async with async_session() as session:
+            if not await session.scalar(text('SELECT pg_try_advisory_xact_lock(:key)'), {'key': self.LOCK_KEY}):
+                return
+            # DDL над секциями блокирует родительскую таблицу, поэтому долго ждать блокировку нельзя:
+            # очередь за ней остановила бы запись истории. Не успели - повторим в следующий раз.
+            await session.execute(text("SET LOCAL lock_timeout = '5s'"))
+
+            existing = set(await self._partitions(session))
+            for offset in range(self.months_ahead + 1):
+                month = _shift_month(current, offset)
+                if month not in existing:
+                    await session.execute(text(
+                        f'CREATE TABLE IF NOT EXISTS {SearchHistory.partition_name(month)} PARTITION OF search_history '
+                        f"FOR VALUES FROM ('{month}') TO ('{_shift_month(month, 1)}')"
+                    ))
+                    self.partitions_created += 1
+                    logger.info(f'Создана секция истории поиска за {month:%Y-%m}.')
+
+            if self.retention_months:
+                oldest = _shift_month(current, 1 - self.retention_months)
+                for month in sorted(month for month in existing if month < oldest):
+                    await session.execute(text(f'DROP TABLE {SearchHistory.partition_name(month)}'))
+                    self.partitions_dropped += 1
+                    logger.info(f'Удалена секция истории поиска за {month:%Y-%m}.')
+            await session.commit()
+
+    @staticmethod
+    async def _partitions(session: AsyncSession) -> list[date]:
+        result = await session.execute(text(
+            "SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid "
+            "WHERE i.inhparent = 'search_history'::regclass"
+        ))
+        months = []
+        for name in result.scalars():
+            try:
+                months.append(datetime.strptime(name.removeprefix(HISTORY_PARTITION_PREFIX), '%Y_%m').date())
+            except ValueError:
+                logger.warning(f'Секция истории поиска {name} имеет неизвестное имя и не обслуживается.')
+        return months
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await self.run_once()
+            except Exception as e:
+                logger.error(f'Ошибка при обслуживании секций истории поиска: {e}')
+            await asyncio.sleep(self.interval)
+
+
+def _shift_month(month: date, offset: int) -> date:
+    index = month.year * 12 + month.month - 1 + offset
+    return date(index // 12, index % 12 + 1, 1)
+
+
+search_history_writer: SearchHistoryWriter | None = None
+search_history_maintenance: SearchHistoryMaintenance | None = None
+
+
+async def get_search_history_writer() -> SearchHistoryWriter | None:
+    return search_history_writer
@@ -5,6 +5,7 @@ from typing import Annotated
 from fastapi import Depends
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from core.password import PasswordHasher, get_password_hasher
 from db.database import get_session
 from models.users import User
 from schemas.users import UserCreate
@@ -12,6 +13,7 @@ from services.base_repository import BaseRepository
 
 logger = logging.getLogger(__name__)
 DatabaseDep = Annotated[AsyncSession, Depends(get_session)]
+PasswordHasherDep = Annotated[PasswordHasher, Depends(get_password_hasher)]
 
 
 class UserServiceABC(ABC):
@@ -29,14 +31,16 @@ class UserServiceABC(ABC):
 
 
 class UserService(BaseRepository, UserServiceABC):
-    def __init__(self, db: AsyncSession):
+    def __init__(self, db: AsyncSession, password_hasher: PasswordHasher):
         super().__init__(db)
+        self.password_hasher = password_hasher
 
     async def authenticate_user(self, username: str, password: str) -> User | None:
         """
         Аутентифицирует пользователя по имени пользователя и паролю.
         """
-        if (user := await self._execute_query(User, User.login == username)) and user.check_password(password):
+        user = await self._execute_query(User, User.login == username)
+        if user and await self.password_hasher.verify(user.password, password):
             logger.info(f'Пользователь \'{username}\' успешно вошел в систему.')
             return user
 
@@ -47,7 +51,7 @@ class UserService(BaseRepository, UserServiceABC):
         """
         Создает нового пользователя.
         """
-        new_user = User.from_schema(user_data)
+        new_user = User.from_schema(user_data, await self.password_hasher.hash(user_data.password))
         if saved_user := await self._save_entities(new_user):
             logger.info(f'Пользователь \'{new_user.login}\' успешно создан.')
             return saved_user
@@ -67,5 +71,5 @@ class UserService(BaseRepository, UserServiceABC):
         return None
 
 
-def get_user_service(db: DatabaseDep) -> UserServiceABC:
-    return UserService(db)
+def get_user_service(db: DatabaseDep, password_hasher: PasswordHasherDep) -> UserServiceABC:
+    return UserService(db, password_hasher)
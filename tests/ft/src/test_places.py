@@ -1,3 +1,4 @@
+import json
 from http import HTTPStatus
 
 import pytest
@@ -44,6 +45,24 @@ async def test_search_places_authorized(register_user, make_get_request):
     assert len(body) > 0
 
 
+@pytest.mark.asyncio
+async def test_search_places_normalized_query(make_get_request):
+    """
+    Запросы, отличающиеся регистром, пробелами и limit, возвращают одни и те же места.
+    """
+    # Arrange
+    url = f'{test_settings.service_url}/api/v1/places/search'
+
+    # Act
+    _, status, body = await make_get_request(url, params={'query': 'Berlin', 'limit': 5})
+    _, short_status, short_body = await make_get_request(url, params={'query': '  BERLIN ', 'limit': 2})
+
+    # Assert
+    assert status == HTTPStatus.OK and short_status == HTTPStatus.OK
+    assert 0 < len(short_body) <= 2
+    assert [item['place_id'] for item in short_body] == [item['place_id'] for item in body[:len(short_body)]]
+
+
 @pytest.mark.asyncio
 async def test_nearby_places_unauthorized(make_get_request):
     """
@@ -95,6 +114,48 @@ async def test_nearby_places_authorized(register_user, make_get_request):
     assert len(body) > 0
 
 
+@pytest.mark.asyncio
+async def test_nearby_places_batch(make_post_request):
+    """
+    Пользователь ищет ближайшие места сразу для нескольких точек, включая повторяющуюся и некорректную.
+    """
+    # Arrange
+    url = f'{test_settings.service_url}/api/v1/places/nearby/batch'
+    point = {'lat': 55.7558, 'lon': 37.6173, 'tags': ['amenity:restaurant'], 'radius': 500, 'limit': 5}
+    items = [point, {**point, 'lat': 55.7560}, point, {**point, 'tags': ['amenity:nonexistent_tag_value']}]
+
+    # Act
+    _, status, body = await make_post_request(url, json_data={'items': items})
+
+    # Assert
+    assert status == HTTPStatus.OK
+    assert len(body) == len(items)
+    assert body[0]['status_code'] == HTTPStatus.OK and body[0]['places']
+    assert body[2] == body[0]
+    assert body[3]['status_code'] != HTTPStatus.OK and body[3]['detail']
+
+
+@pytest.mark.asyncio
+async def test_nearby_places_batch_null_tags(make_post_request):
+    """
+    Пользователь передает в пакетном запросе точку с "tags": null - она ищется так же, как точка без тегов.
+    """
+    # Arrange
+    url = f'{test_settings.service_url}/api/v1/places/nearby/batch'
+    point = {'lat': 55.7558, 'lon': 37.6173, 'radius': 500, 'limit': 5}
+    items = [point, {**point, 'tags': None}]
+
+    # Act
+    _, status, body = await make_post_request(url, json_data={'items': items})
+
+    # Assert
+    assert status == HTTPStatus.OK
+    assert len(body) == len(items)
+    assert body[0]['status_code'] == HTTPStatus.OK and body[0]['places']
+    assert body[1]['status_code'] == HTTPStatus.OK
+    assert body[1]['places'] == body[0]['places']
+
+
 @pytest.mark.asyncio
 async def test_get_favorite_places_unauthorized(make_get_request):
     """
@@ -174,6 +235,160 @@ async def test_get_favorite_places_authorized_with_data(register_user, make_post
     assert place_id in favorite_ids, f'Добавленного place_id {place_id} нет в списке избранного'
 
 
+@pytest.mark.asyncio
+async def test_get_favorite_places_paginated(register_user, make_get_request, make_post_request):
+    """
+    Авторизованный пользователь постранично получает список избранных мест с данными мест.
+    """
+    # Arrange
+    user_info = await register_user
+    headers = {'Authorization': f'Bearer {user_info["access_token"]}'}
+    search_url = f'{test_settings.service_url}/api/v1/places/search'
+    favorite_url = f'{test_settings.service_url}/api/v1/places/favorite'
+    _, _, search_body = await make_get_request(search_url, params={'query': 'Berlin', 'limit': 2})
+    place_ids = [item['place_id'] for item in search_body[:2]]
+    for place_id in place_ids:
+        await make_post_request(favorite_url, json_data={'place_id': place_id}, headers=headers)
+
+    # Act
+    first_headers, first_status, first_body = await make_get_request(
+        favorite_url, params={'limit': 1}, headers=headers)
+    _, second_status, second_body = await make_get_request(
+        favorite_url, params={'limit': 1, 'cursor': first_headers.get('X-Next-Cursor', '')}, headers=headers)
+    _, invalid_status, _ = await make_get_request(
+        favorite_url, params={'limit': 1, 'cursor': 'invalid'}, headers=headers)
+
+    # Assert
+    assert first_status == HTTPStatus.OK and second_status == HTTPStatus.OK
+    assert len(first_body) == 1 and len(second_body) == 1
+    assert {first_body[0]['place_id'], second_body[0]['place_id']} == set(place_ids)
+    assert first_body[0]['place']['display_name']
+    assert invalid_status == HTTPStatus.BAD_REQUEST
+
+
+@pytest.mark.asyncio
+async def test_update_favorite_places_bulk(register_user, make_get_request, make_post_request):
+    """
+    Авторизованный пользователь пакетно добавляет и удаляет места избранного.
+    """
+    # Arrange
+    user_info = await register_user
+    headers = {'Authorization': f'Bearer {user_info["access_token"]}'}
+    search_url = f'{test_settings.service_url}/api/v1/places/search'
+    bulk_url = f'{test_settings.service_url}/api/v1/places/favorite/bulk'
+    favorite_url = f'{test_settings.service_url}/api/v1/places/favorite'
+    _, _, search_body = await make_get_request(search_url, params={'query': 'Paris', 'limit': 2})
+    first_id, second_id = [item['place_id'] for item in search_body[:2]]
+
+    # Act
+    _, add_status, add_body = await make_post_request(
+        bulk_url, json_data={'add': [first_id, second_id, 'unknown_place_id']}, headers=headers)
+    _, remove_status, remove_body = await make_post_request(
+        bulk_url, json_data={'remove': [first_id]}, headers=headers)
+    _, _, favorites = await make_get_request(favorite_url, headers=headers)
+
+    # Assert
+    assert add_status == HTTPStatus.OK
+    assert set(add_body['added']) == {first_id, second_id}
+    assert add_body['skipped'] == ['unknown_place_id']
+    assert remove_status == HTTPStatus.OK and remove_body['removed'] == [first_id]
+    assert [item['place_id'] for item in favorites] == [second_id]
+
+
+@pytest.mark.asyncio
+async def test_get_search_history_paginated(register_user, make_get_request):
+    """
+    Авторизованный пользователь постранично получает историю своих поисков.
+    """
+    # Arrange
+    user_info = await register_user
+    headers = {'Authorization': f'Bearer {user_info["access_token"]}'}
+    search_url = f'{test_settings.service_url}/api/v1/places/search'
+    history_url = f'{test_settings.service_url}/api/v1/places/history'
+    _, _, search_body = await make_get_request(search_url, params={'query': 'Berlin', 'limit': 2}, headers=headers)
+    place_ids = {item['place_id'] for item in search_body[:2]}
+
+    # Act
+    first_headers, first_status, first_body = await make_get_request(
+        history_url, params={'limit': 1}, headers=headers)
+    _, second_status, second_body = await make_get_request(
+        history_url, params={'limit': 1, 'cursor': first_headers.get('X-Next-Cursor', '')}, headers=headers)
+    _, unauthorized_status, _ = await make_get_request(history_url)
+
+    # Assert
+    assert first_status == HTTPStatus.OK and second_status == HTTPStatus.OK
+    assert {first_body[0]['place_id'], second_body[0]['place_id']} == place_ids
+    assert first_body[0]['place']['display_name']
+    assert unauthorized_status == HTTPStatus.UNAUTHORIZED
+
+
+@pytest.mark.asyncio
+async def test_export_search_history_csv(register_user, make_get_request):
+    """
+    Авторизованный пользователь выгружает историю поиска в CSV.
+    """
+    # Arrange
+    user_info = await register_user
+    headers = {'Authorization': f'Bearer {user_info["access_token"]}'}
+    search_url = f'{test_settings.service_url}/api/v1/places/search'
+    export_url = f'{test_settings.service_url}/api/v1/places/history/export'
+    _, _, search_body = await make_get_request(search_url, params={'query': 'Berlin', 'limit': 2}, headers=headers)
+
+    # Act
+    response_headers, status, body = await make_get_request(export_url, params={'format': 'csv'}, headers=headers)
+
+    # Assert
+    lines = body.splitlines()
+    assert status == HTTPStatus.OK
+    assert response_headers['Content-Type'].startswith('text/csv')
+    assert lines[0] == 'id,place_id,search_date,lat,lon,name,display_name,class,type'
+    assert len(lines) == len(search_body) + 1
+
+
+@pytest.mark.asyncio
+async def test_export_favorite_places_ndjson(register_user, make_get_request, make_post_request):
+    """
+    Авторизованный пользователь выгружает избранные места в NDJSON.
+    """
+    # Arrange
+    user_info = await register_user
+    headers = {'Authorization': f'Bearer {user_info["access_token"]}'}
+    search_url = f'{test_settings.service_url}/api/v1/places/search'
+    favorite_url = f'{test_settings.service_url}/api/v1/places/favorite'
+    _, _, search_body = await make_get_request(search_url, params={'query': 'Berlin', 'limit': 2})
+    place_ids = {item['place_id'] for item in search_body[:2]}
+    for place_id in place_ids:
+        await make_post_request(favorite_url, json_data={'place_id': place_id}, headers=headers)
+
+    # Act
+    _, status, body = await make_get_request(f'{favorite_url}/export', headers=headers)
+
+    # Assert
+    rows = [json.loads(line) for line in body.splitlines()]
+    assert status == HTTPStatus.OK
+    assert {row['place_id'] for row in rows} == place_ids
+    assert all(row['display_name'] for row in rows)
+
+
+@pytest.mark.asyncio
+async def test_autocomplete_places(make_get_request):
+    """
+    Подсказки мест по началу названия: повторный запрос отдает те же места.
+    """
+    # Arrange
+    url = f'{test_settings.service_url}/api/v1/places/autocomplete'
+    query_params = {'query': 'Berl', 'limit': 3}
+
+    # Act
+    _, first_status, first_body = await make_get_request(url, params=query_params)
+    _, second_status, second_body = await make_get_request(url, params=query_params)
+
+    # Assert
+    assert first_status == HTTPStatus.OK and second_status == HTTPStatus.OK
+    assert 0 < len(first_body) <= 3 and 0 < len(second_body) <= 3
+    assert all('berl' in item['display_name'].lower() for item in first_body + second_body)
+
+
 @pytest.mark.asyncio
 async def test_add_favorite_place_unauthorized(make_post_request):
     """
@@ -0,0 +1,267 @@
+"""
+Генератор нагрузки для Travel Companion.
+
+Воспроизводит смесь запросов поиска, автодополнения, ближайших мест, избранного и аутентификации
+и строит отчет с p50/p95/p99 задержек и RPS по каждому эндпоинту.
+
+Примеры:
+    python loadgen.py --duration 60 --concurrency 50 --output reports/run.json
+    python loadgen.py --mix search=60,nearby=30,favorite=5,auth=5 --compare reports/baseline.json
+    python loadgen.py --mix search=30,autocomplete=30,nearby=30,favorite=5,auth=5
+    python loadgen.py --report reports/run.json --compare reports/baseline.json
+"""
+import argparse
+import asyncio
+import json
+import math
+import random
+import string
+import time
+from collections import defaultdict
+from datetime import datetime, timezone
+from pathlib import Path
+
+import aiohttp
+
+from settings import load_settings
+
+SEARCH_QUERIES = [
+    'Berlin', 'Paris', 'London', 'Красная площадь', 'Moscow', 'Rome', 'Madrid', 'Prague', 'Vienna', 'Amsterdam',
+    'Eiffel Tower', 'Colosseum', 'Brandenburg Gate', 'Tower Bridge', 'Sagrada Familia', 'Louvre', 'Hermitage',
+    'Charles Bridge', 'Dam Square', 'Plaza Mayor', 'Big Ben', 'Kremlin', 'Trevi Fountain', 'Reichstag',
+]
+CITY_CENTERS = [
+    (52.5200, 13.4050), (48.8566, 2.3522), (51.5074, -0.1278), (55.7558, 37.6173), (41.9028, 12.4964),
+    (40.4168, -3.7038), (50.0755, 14.4378), (48.2082, 16.3738), (52.3676, 4.9041), (40.7128, -74.0060),
+]
+NEARBY_TAGS = ['amenity:restaurant', 'amenity:cafe', 'tourism:hotel', 'amenity:parking', 'restaurant']
+NEARBY_RADII = [100, 250, 500, 1000, 2000, 5000]
+DEFAULT_MIX = 'search=45,nearby=35,favorite=15,auth=5'
+
+
+def zipf_choice(items: list, s: float = 1.1):
+    """
+    Выбор с распределением Ципфа: первые элементы популярнее, как в реальном трафике.
+    """
+    weights = [1 / (rank ** s) for rank in range(1, len(items) + 1)]
+    return random.choices(items, weights=weights)[0]
+
+
+def random_email() -> str:
+    return ''.join(random.choices(string.ascii_letters, k=12)) + '@example.com'
+
+
+class Recorder:
+    def __init__(self):
+        self.latencies: dict[str, list[float]] = defaultdict(list)
+        self.errors: dict[str, int] = defaultdict(int)
+        self.statuses: dict[str, dict[int, int]] = defaultdict(lambda: defaultdict(int))
+
+    def record(self, endpoint: str, latency: float, status: int) -> None:
+        self.latencies[endpoint].append(latency)
+        self.statuses[endpoint][status] += 1
+        if status >= 500 or status == 0:
+            self.errors[endpoint] += 1
+
+
+class LoadGenerator:
+    def __init__(self, base_url: str, users: int, think_time: float):
+        self.api_url = f'{base_url}/api/v1'
+        self.users_count = users
+        self.think_time = think_time
+        self.users: list[dict] = []
+        self.place_ids: list[str] = []
+        self.recorder = Recorder()
+        self.session: aiohttp.ClientSession | None = None
+
+    async def request(self, endpoint: str, method: str, path: str, **kwargs) -> tuple[int, object]:
+        started = time.perf_counter()
+        status, body = 0, None
+        try:
+            async with self.session.request(method, f'{self.api_url}{path}', **kwargs) as response:
+                status = response.status
+                body = await response.json(content_type=None)
+        except (aiohttp.ClientError, asyncio.TimeoutError, json.JSONDecodeError):
+            pass
+        self.recorder.record(endpoint, time.perf_counter() - started, status)
+        return status, body
+
+    async def setup(self) -> None:
+        """
+        Регистрирует пользователей, от имени которых идет нагрузка. Эти запросы в отчет не попадают.
+        """
+        for _ in range(self.users_count):
+            credentials = {'login': random_email(), 'password': 'LoadTest123', 'first_name': 'Load', 'last_name': 'Test'}
+            async with self.session.post(f'{self.api_url}/auth/signup', json=credentials) as response:
+                if response.status != 201:
+                    raise RuntimeError(f'Не удалось зарегистрировать пользователя: {response.status}')
+                tokens = await response.json()
+            self.users.append({'credentials': credentials, 'access_token': tokens['access_token']})
+
+    def _headers(self, user: dict | None) -> dict:
+        return {'Authorization': f'Bearer {user["access_token"]}'} if user else {}
+
+    async def scenario_search(self, user: dict | None) -> None:
+        params = {'query': zipf_choice(SEARCH_QUERIES), 'limit': random.choice([5, 10])}
+        status, body = await self.request('GET /places/search', 'GET', '/places/search',
+                                          params=params, headers=self._headers(user))
+        if status == 200 and body and len(self.place_ids) < 10_000:
+            self.place_ids.extend(item['place_id'] for item in body[:3])
+
+    async def scenario_autocomplete(self, user: dict | None) -> None:
+        """
+        Набор запроса по буквам: подсказка запрашивается на каждое нажатие, начиная со второго символа.
+        """
+        query = zipf_choice(SEARCH_QUERIES)
+        for length in range(2, len(query) + 1):
+            await self.request('GET /places/autocomplete', 'GET', '/places/autocomplete',
+                               params={'query': query[:length], 'limit': 5})
+
+    async def scenario_nearby(self, user: dict | None) -> None:
+        lat, lon = zipf_choice(CITY_CENTERS)
+        params = {
+            'lat': round(lat + random.gauss(0, 0.01), 6),
+            'lon': round(lon + random.gauss(0, 0.01), 6),
+            'tags': random.choice(NEARBY_TAGS),
+            'radius': random.choice(NEARBY_RADII),
+            'limit': random.choice([5, 10, 20]),
+        }
+        await self.request('GET /places/nearby', 'GET', '/places/nearby', params=params, headers=self._headers(user))
+
+    async def scenario_favorite(self, user: dict | None) -> None:
+        user = user or random.choice(self.users)
+        headers = self._headers(user)
+        roll = random.random()
+        if roll < 0.7 or not self.place_ids:
+            await self.request('GET /places/favorite', 'GET', '/places/favorite', headers=headers)
+        elif roll < 0.9:
+            await self.request('POST /places/favorite', 'POST', '/places/favorite',
+                               json={'place_id': random.choice(self.place_ids)}, headers=headers)
+        else:
+            await self.request('DELETE /places/favorite', 'DELETE',
+                               f'/places/favorite/{random.choice(self.place_ids)}', headers=headers)
+
+    async def scenario_auth(self, user: dict | None) -> None:
+        credentials = (user or random.choice(self.users))['credentials']
+        await self.request('POST /auth/login', 'POST', '/auth/login',
+                           json={'login': credentials['login'], 'password': credentials['password']})
+
+    async def worker(self, deadline: float, mix: dict[str, int]) -> None:
+        scenarios = [getattr(self, f'scenario_{name}') for name in mix]
+        weights = list(mix.values())
+        while time.perf_counter() < deadline:
+            # Часть трафика анонимная, как у реальных клиентов.
+            user = random.choice(self.users) if self.users and random.random() < 0.7 else None
+            await random.choices(scenarios, weights=weights)[0](user)
+            if self.think_time:
+                await asyncio.sleep(random.expovariate(1 / self.think_time))
+
+    async def run(self, duration: float, concurrency: int, mix: dict[str, int]) -> float:
+        connector = aiohttp.TCPConnector(limit=concurrency)
+        timeout = aiohttp.ClientTimeout(total=30)
+        async with aiohttp.ClientSession(connector=connector, timeout=timeout) as self.session:
+            await self.setup()
+            started = time.perf_counter()
+            deadline = started + duration
+            await asyncio.gather(*(self.worker(deadline, mix) for _ in range(concurrency)))
+            return time.perf_counter() - started
+
+
+def percentile(sorted_values: list[float], p: float) -> float:
+    if not sorted_values:
+        return 0.0
+    # Метод ближайшего ранга.
+    index = max(0, math.ceil(p / 100 * len(sorted_values)) - 1)
+    return sorted_values[index]
+
+
+def build_report(recorder: Recorder, elapsed: float, config: dict) -> dict:
+    endpoints = {}
+    for endpoint, latencies in sorted(recorder.latencies.items()):
+        values = sorted(latencies)
+        endpoints[endpoint] = {
+            'count': len(values),
+            'errors': recorder.errors[endpoint],
+            'rps': round(len(values) / elapsed, 2),
+            'mean_ms': round(sum(values) / len(values) * 1000, 2),
+            'p50_ms': round(percentile(values, 50) * 1000, 2),
+            'p95_ms': round(percentile(values, 95) * 1000, 2),
+            'p99_ms': round(percentile(values, 99) * 1000, 2),
+            'statuses': {str(status): count for status, count in sorted(recorder.statuses[endpoint].items())},
+        }
+    total = sum(item['count'] for item in endpoints.values())
+    return {
+        'created_at': datetime.now(timezone.utc).isoformat(),
+        'config': config,
+        'elapsed_s': round(elapsed, 2),
+        'total_rps': round(total / elapsed, 2) if elapsed else 0.0,
+        'endpoints': endpoints,
+    }
+
+
+def print_report(report: dict, baseline: dict | None = None) -> None:
+    metrics = ['rps', 'p50_ms', 'p95_ms', 'p99_ms']
+    header = f'{"endpoint":<26}{"count":>8}{"errors":>8}' + ''.join(f'{m:>18}' for m in metrics)
+    print(header)
+    print('-' * len(header))
+    for endpoint, item in report['endpoints'].items():
+        row = f'{endpoint:<26}{item["count"]:>8}{item["errors"]:>8}'
+        base = (baseline or {}).get('endpoints', {}).get(endpoint)
+        for metric in metrics:
+            cell = f'{item[metric]:.2f}'
+            if base and base[metric]:
+                cell += f' ({(item[metric] - base[metric]) / base[metric] * 100:+.1f}%)'
+            row += f'{cell:>18}'
+        print(row)
+    print(f'\nВсего RPS: {report["total_rps"]}', end='')
+    if baseline:
+        print(f' (было {baseline["total_rps"]})', end='')
+    print()
+
+
+def parse_mix(value: str) -> dict[str, int]:
+    mix = {}
+    for part in value.split(','):
+        name, _, weight = part.partition('=')
+        if name not in ('search', 'autocomplete', 'nearby', 'favorite', 'auth'):
+            raise argparse.ArgumentTypeError(f'Неизвестный сценарий: {name}')
+        mix[name] = int(weight)
+    return mix
+
+
+def main() -> None:
+    settings = load_settings
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--url', default=settings.service_url)
+    parser.add_argument('--duration', type=float, default=settings.duration)
+    parser.add_argument('--concurrency', type=int, default=settings.concurrency)
+    parser.add_argument('--users', type=int, default=settings.users)
+    parser.add_argument('--think-time', type=float, default=0.0, help='Средняя пауза между запросами, с')
+    parser.add_argument('--mix', type=parse_mix, default=parse_mix(DEFAULT_MIX))
+    parser.add_argument('--output', type=Path, help='Куда сохранить отчет в JSON')
+    parser.add_argument('--compare', type=Path, help='Отчет предыдущего прогона для сравнения')
+    parser.add_argument('--report', type=Path, help='Только вывести сохраненный отчет, без нагрузки')
+    args = parser.parse_args()
+
+    baseline = json.loads(args.compare.read_text()) if args.compare else None
+    if args.report:
+        print_report(json.loads(args.report.read_text()), baseline)
+        return
+
+    generator = LoadGenerator(args.url, users=args.users, think_time=args.think_time)
+    elapsed = asyncio.run(generator.run(args.duration, args.concurrency, args.mix))
+    report = build_report(generator.recorder, elapsed, {
+        'url': args.url,
+        'duration': args.duration,
+        'concurrency': args.concurrency,
+        'users': args.users,
+        'mix': args.mix,
+    })
+    print_report(report, baseline)
+    if args.output:
+        args.output.parent.mkdir(parents=True, exist_ok=True)
+        args.output.write_text(json.dumps(report, ensure_ascii=False, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,5 @@
+set -ex
+docker-compose up -d --build
+sleep 10
+mkdir -p reports
+python loadgen.py --output "reports/$(date +%Y%m%d-%H%M%S).json" "$@"
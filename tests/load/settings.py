@@ -0,0 +1,12 @@
+from pydantic import Field
+from pydantic_settings import BaseSettings
+
+
+class LoadSettings(BaseSettings):
+    service_url: str = Field(default='http://127.0.0.1:5002')
+    duration: float = Field(default=60.0)
+    concurrency: int = Field(default=50)
+    users: int = Field(default=20)
+
+
+load_settings = LoadSettings()
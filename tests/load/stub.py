@@ -0,0 +1,150 @@
+"""
+Заглушка LocationIQ для нагрузочного тестирования.
+
+Отвечает на /v1/search, /v1/nearby и /v1/autocomplete детерминированными данными в формате LocationIQ
+с настраиваемой задержкой и долей ошибок, чтобы измерять сервис без внешней сети и квот.
+
+Запуск: uvicorn stub:app --host 0.0.0.0 --port 8080
+"""
+import asyncio
+import hashlib
+import math
+import random
+
+from fastapi import FastAPI
+from fastapi.responses import ORJSONResponse
+from pydantic import Field
+from pydantic_settings import BaseSettings
+
+METERS_PER_DEGREE = 111_320
+
+DEFAULT_TAGS = ['amenity:restaurant', 'amenity:cafe', 'tourism:hotel', 'amenity:parking', 'shop:supermarket']
+
+# Каталог для /v1/autocomplete: подсказки по одному префиксу не меняются при следующих нажатиях клавиш.
+AUTOCOMPLETE_NAMES = [
+    'Berlin', 'Paris', 'London', 'Moscow', 'Rome', 'Madrid', 'Prague', 'Vienna', 'Amsterdam', 'Barcelona',
+    'Eiffel Tower', 'Colosseum', 'Brandenburg Gate', 'Tower Bridge', 'Sagrada Familia', 'Louvre', 'Hermitage',
+    'Charles Bridge', 'Dam Square', 'Plaza Mayor', 'Big Ben', 'Kremlin', 'Trevi Fountain', 'Reichstag',
+]
+AUTOCOMPLETE_SUFFIXES = ['', ' Central Station', ' Airport', ' Old Town', ' Cathedral', ' Museum', ' Park', ' Hotel']
+AUTOCOMPLETE_CATALOG = [name + suffix for name in AUTOCOMPLETE_NAMES for suffix in AUTOCOMPLETE_SUFFIXES]
+
+
+class StubSettings(BaseSettings):
+    stub_latency_ms: float = Field(default=150.0)
+    stub_jitter_ms: float = Field(default=50.0)
+    stub_error_rate: float = Field(default=0.0)
+    stub_search_results: int = Field(default=10)
+
+
+stub_settings = StubSettings()
+
+app = FastAPI(title='LocationIQ stub', default_response_class=ORJSONResponse)
+
+
+def _seed(*parts) -> int:
+    return int(hashlib.md5(':'.join(map(str, parts)).encode()).hexdigest()[:12], 16)
+
+
+async def _simulate():
+    delay = max(0.0, random.gauss(stub_settings.stub_latency_ms, stub_settings.stub_jitter_ms))
+    await asyncio.sleep(delay / 1000)
+    if random.random() < stub_settings.stub_error_rate:
+        return ORJSONResponse({'error': 'Rate Limited Second'}, status_code=429)
+    return None
+
+
+@app.get('/v1/search')
+async def search(q: str, key: str = '', format: str = 'json', limit: int | None = None):
+    if error := await _simulate():
+        return error
+
+    rng = random.Random(_seed('search', q.strip().lower()))
+    count = min(limit or stub_settings.stub_search_results, stub_settings.stub_search_results)
+    return [
+        {
+            'place_id': str(_seed('search', q.strip().lower(), i)),
+            'lat': str(rng.uniform(-60, 70)),
+            'lon': str(rng.uniform(-180, 180)),
+            'display_name': f'{q.strip().title()} {i}, Stub City, Stub Country',
+            'class': 'place',
+            'type': 'city' if i == 0 else 'suburb',
+            'importance': round(1 - i / (count + 1), 3),
+        }
+        for i in range(count)
+    ]
+
+
+@app.get('/v1/autocomplete')
+async def autocomplete(q: str, key: str = '', limit: int = 10, dedupe: int = 0):
+    if error := await _simulate():
+        return error
+
+    query_words = q.lower().split()
+    places = []
+    for title in AUTOCOMPLETE_CATALOG:
+        title_words = title.lower().split()
+        if not all(any(word.startswith(query_word) for word in title_words) for query_word in query_words):
+            continue
+        rng = random.Random(_seed('autocomplete', title))
+        places.append({
+            'place_id': str(_seed('autocomplete', title)),
+            'lat': str(rng.uniform(-60, 70)),
+            'lon': str(rng.uniform(-180, 180)),
+            'display_name': f'{title}, Stub City, Stub Country',
+            'display_place': title,
+            'class': 'place',
+            'type': 'city',
+        })
+        if len(places) == limit:
+            break
+    if not places:
+        return ORJSONResponse({'error': 'Unable to geocode'}, status_code=404)
+    return places
+
+
+@app.get('/v1/nearby')
+async def nearby(
+        lat: float,
+        lon: float,
+        key: str = '',
+        tag: str = '',
+        radius: int = 500,
+        limit: int = 10,
+        format: str = 'json',
+):
+    if error := await _simulate():
+        return error
+
+    tags = [t for t in tag.split(',') if t and not t.startswith('!')] or DEFAULT_TAGS
+    # Места генерируются на фиксированной сетке, поэтому соседние запросы видят одни и те же места.
+    step = 0.001
+    base_lat, base_lon = round(lat / step), round(lon / step)
+    cells = math.ceil(radius / (step * METERS_PER_DEGREE)) + 1
+    places = []
+    for i in range(base_lat - cells, base_lat + cells + 1):
+        for j in range(base_lon - cells, base_lon + cells + 1):
+            seed = _seed('nearby', i, j)
+            place_lat = (i + (seed % 1000) / 1000) * step
+            place_lon = (j + (seed // 1000 % 1000) / 1000) * step
+            distance = math.hypot(
+                (place_lat - lat) * METERS_PER_DEGREE,
+                (place_lon - lon) * METERS_PER_DEGREE * math.cos(math.radians(lat)),
+            )
+            if distance > radius:
+                continue
+            place_class, _, place_type = tags[seed % len(tags)].partition(':')
+            places.append({
+                'place_id': str(seed),
+                'lat': str(place_lat),
+                'lon': str(place_lon),
+                'display_name': f'Stub {place_type} {seed % 10000}, Stub Street, Stub City',
+                'name': f'Stub {place_type} {seed % 10000}',
+                'class': place_class,
+                'type': place_type if place_type != '*' else 'yes',
+                'distance': round(distance),
+            })
+    places.sort(key=lambda item: item['distance'])
+    if not places:
+        return ORJSONResponse({'error': 'Unable to geocode'}, status_code=404)
+    return places[:limit]
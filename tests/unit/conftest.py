@@ -0,0 +1,5 @@
+import sys
+from pathlib import Path
+
+# Модульные тесты импортируют код сервиса напрямую, без запуска приложения.
+sys.path.insert(0, str(Path(__file__).resolve().parents[2] / 'src'))
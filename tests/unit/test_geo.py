@@ -0,0 +1,110 @@
+import math
+
+import pytest
+
+from core.geo import (
+    EARTH_RADIUS,
+    bounding_boxes,
+    cells_in_radius,
+    circle_contains_cell,
+    decode_geohash_bounds,
+    encode_geohash,
+)
+
+
+def destination(lat: float, lon: float, distance: float, bearing: float) -> tuple[float, float]:
+    """
+    Точка на заданном расстоянии и азимуте от исходной (на сфере радиуса EARTH_RADIUS).
+    """
+    angle = distance / EARTH_RADIUS
+    phi1, lambda1, theta = math.radians(lat), math.radians(lon), math.radians(bearing)
+    phi2 = math.asin(math.sin(phi1) * math.cos(angle) + math.cos(phi1) * math.sin(angle) * math.cos(theta))
+    lambda2 = lambda1 + math.atan2(math.sin(theta) * math.sin(angle) * math.cos(phi1),
+                                   math.cos(angle) - math.sin(phi1) * math.sin(phi2))
+    return math.degrees(phi2), (math.degrees(lambda2) + 540) % 360 - 180
+
+
+@pytest.mark.parametrize('lat, lon, precision, expected', [
+    (42.6, -5.6, 5, 'ezs42'),
+    (57.64911, 10.40744, 11, 'u4pruydqqvj'),
+])
+def test_encode_geohash_known_vectors(lat, lon, precision, expected):
+    """
+    Кодирование совпадает с эталонными значениями geohash, а ячейка содержит исходную точку.
+    """
+    # Act
+    cell = encode_geohash(lat, lon, precision)
+    lat_min, lat_max, lon_min, lon_max = decode_geohash_bounds(cell)
+
+    # Assert
+    assert cell == expected
+    assert lat_min <= lat <= lat_max and lon_min <= lon <= lon_max
+
+
+def test_bounding_boxes_split_at_antimeridian():
+    """
+    Круг, пересекающий меридиан 180°, описывается двумя прямоугольниками по обе стороны от него.
+    """
+    # Act
+    boxes = bounding_boxes(0.0, 179.99, 5000)
+
+    # Assert
+    assert len(boxes) == 2
+    assert {box[3] for box in boxes} >= {180.0} and {box[2] for box in boxes} >= {-180.0}
+
+
+def test_bounding_boxes_around_pole():
+    """
+    Круг, содержащий полюс, описывается полосой по всем долготам.
+    """
+    # Act
+    boxes = bounding_boxes(89.99, 10.0, 5000)
+
+    # Assert
+    assert boxes == [(pytest.approx(89.99 - math.degrees(5000 / EARTH_RADIUS)), 90.0, -180.0, 180.0)]
+
+
+@pytest.mark.parametrize('lat, lon, radius, precision', [
+    (55.7558, 37.6173, 500, 7),
+    (55.7558, 37.6173, 5000, 6),
+    (0.0, 179.99, 5000, 6),
+    (0.0, -179.995, 500, 7),
+    (70.0, 179.9, 5000, 6),
+    (84.0, 0.0, 5000, 6),
+    (89.97, 10.0, 5000, 5),
+    (-89.98, -170.0, 5000, 5),
+])
+def test_cells_in_radius_cover_circle(lat, lon, radius, precision):
+    """
+    Ячейки круга содержат все его точки, в том числе у полюсов и по ту сторону меридиана 180°.
+    """
+    # Act
+    cells = cells_in_radius(lat, lon, radius, precision, max_cells=100_000)
+
+    # Assert
+    assert cells is not None
+    for bearing in range(0, 360, 5):
+        for share in (0.25, 0.5, 0.75, 0.999):
+            point_lat, point_lon = destination(lat, lon, radius * share, bearing)
+            assert encode_geohash(point_lat, point_lon, precision) in cells, (bearing, share)
+
+
+def test_cells_in_radius_limit():
+    """
+    Если ячеек больше max_cells, возвращается None и локальный ответ не строится.
+    """
+    assert cells_in_radius(55.7558, 37.6173, 5000, 8, max_cells=100) is None
+
+
+def test_circle_contains_cell():
+    """
+    Ячейка в центре большого круга покрыта им целиком, ячейка на границе - нет.
+    """
+    # Arrange
+    lat, lon = 55.7558, 37.6173
+    center_cell = encode_geohash(lat, lon, 7)
+    edge_cell = encode_geohash(*destination(lat, lon, 500, 90), 7)
+
+    # Assert
+    assert circle_contains_cell(lat, lon, 500, center_cell)
+    assert not circle_contains_cell(lat, lon, 500, edge_cell)
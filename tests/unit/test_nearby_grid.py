@@ -0,0 +1,108 @@
+import pytest
+
+from core.geo import haversine
+from schemas.places import NearbyPlaceRequest
+from services.nearby_grid import answer_from_superset, may_answer_from_superset, quantize_request
+
+from .test_geo import destination
+
+PRECISION = 7
+
+
+def superset_data(superset: NearbyPlaceRequest, distances: list[float]) -> list[dict]:
+    """
+    Ответ LocationIQ на общий запрос ячейки: места на заданных расстояниях от ее центра.
+    """
+    data = []
+    for index, distance in enumerate(distances):
+        lat, lon = destination(superset.lat, superset.lon, distance, index * 37 % 360)
+        data.append({'place_id': str(index), 'lat': str(lat), 'lon': str(lon), 'display_name': f'Place {index}',
+                     'distance': distance})
+    return data
+
+
+@pytest.fixture
+def place() -> NearbyPlaceRequest:
+    return NearbyPlaceRequest(lat=55.7558, lon=37.6173, tags=['amenity:cafe'], radius=500, limit=5)
+
+
+def test_quantize_request_contains_place_circle(place):
+    """
+    Круг общего запроса ячейки содержит круг запроса точки.
+    """
+    # Act
+    superset = quantize_request(place, PRECISION, limit=50)
+
+    # Assert
+    assert haversine(place.lat, place.lon, superset.lat, superset.lon) + place.radius <= superset.radius
+    assert superset.limit == 50 and superset.tags == ['amenity:cafe']
+
+
+def test_answer_from_complete_superset(place):
+    """
+    Если общий ответ не обрезан по limit, ответ для точки строится по нему: места в ее радиусе,
+    по возрастанию расстояния от нее.
+    """
+    # Arrange
+    superset = quantize_request(place, PRECISION, limit=50)
+    data = superset_data(superset, [50, 150, 300, 450, superset.radius - 1])
+
+    # Act
+    answer = answer_from_superset(place, superset, data)
+
+    # Assert
+    expected = sorted(
+        (haversine(place.lat, place.lon, float(item['lat']), float(item['lon'])), item['place_id'])
+        for item in data
+    )
+    expected = [place_id for distance, place_id in expected if distance <= place.radius][:place.limit]
+    assert answer is not None
+    assert [item['place_id'] for item in answer] == expected
+    assert all(item['distance'] <= place.radius for item in answer)
+
+
+def test_answer_from_truncated_superset(place):
+    """
+    Если общий ответ обрезан по limit в радиусе меньше нужного точке и мест в нем не хватает,
+    ответа нет - нужен точный запрос.
+    """
+    # Arrange
+    superset = quantize_request(place, PRECISION, limit=3)
+    data = superset_data(superset, [10, 20, 30])
+
+    # Act
+    answer = answer_from_superset(place, superset, data)
+
+    # Assert
+    assert answer is None
+
+
+def test_answer_from_truncated_superset_with_enough_places(place):
+    """
+    Обрезанный общий ответ подходит, если limit ближайших к точке мест лежат в радиусе его полноты.
+    """
+    # Arrange
+    small = place.model_copy(update={'limit': 2})
+    superset = quantize_request(small, PRECISION, limit=3)
+    data = superset_data(superset, [1, 2, 400])
+
+    # Act
+    answer = answer_from_superset(small, superset, data)
+
+    # Assert
+    assert answer is not None and len(answer) == 2
+
+
+def test_may_answer_from_superset(place):
+    """
+    Общий запрос не выполняется, если заранее известно, что он не ответит на запрос точки.
+    """
+    # Arrange
+    superset = quantize_request(place, PRECISION, limit=50)
+    offset = haversine(place.lat, place.lon, superset.lat, superset.lon)
+
+    # Assert
+    assert may_answer_from_superset(place, superset, known_radius=None)
+    assert may_answer_from_superset(place, superset, known_radius=place.radius + offset)
+    assert not may_answer_from_superset(place, superset, known_radius=place.radius + offset - 1)
+    assert not may_answer_from_superset(place.model_copy(update={'limit': 51}), superset, known_radius=None)